@@ -1,18 +1,44 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox,Text,Scrollbar  
-import ast
-import pandas as pd
-import Levenshtein
-import javalang
-import clang.cindex
 from pathlib import Path
 from tkinter import Tk, Canvas, Button, PhotoImage
 import sys
 import os
+import multiprocessing
+import queue
+import threading
+import time
+import plag_engine
+from plag_display import get_dump, dump_page
+from plag_session import rescore, reset_session, forget
+from plag_allpairs import all_pairs
+from plag_profile import counters, stage, reset_stages, write_configured_reports
+from plag_export import COMPARE_COLUMNS, ALL_PAIRS_COLUMNS, result_row, pair_row, export_rows, format_for_path
+from plag_ingest import READ_ERRORS, is_archive, iter_member_names, count_sources, read_source_by_name
 text_font = ('Times New Roman', 12)
 
 testing_files = []
 file_paths=[]
+# One entry per submission, archive members included. The panes only show
+# the selected one, so nothing else is read or parsed for display.
+testing_names = []
+result_sources = {}
+# Treeview row of each scored submission, so a re-run updates rows in place.
+result_items = {}
+# Export row of each Treeview row, with the full paths and pair details
+# the table itself doesn't show.
+result_details = {}
+
+# Rows are handed from the comparison thread to Tk through a queue that is
+# drained every POLL_MS, at most RESULT_BATCH rows per tick.
+POLL_MS = 100
+RESULT_BATCH = 200
+job_thread = None
+cancel_event = None
+# Archive member lists, built off the Tk thread: a compressed tar has to be
+# decompressed to list it.
+archive_listings = queue.Queue()
+listings_pending = 0
 
 def resource_path(relative_path):
     try:
@@ -34,123 +60,22 @@ def relative_to_assets(path: str) -> Path:
     return ASSETS_PATH / "assets" / Path(path)
 
 
-def preprocess_code(code):
-    return code.strip()
-
-def generate_ast(code, language):
-    try:
-        if language == "Python":
-            tree = ast.parse(code)
-        elif language == "Java":
-            tree = javalang.parse.parse(code)
-        elif language == "C/C++":
-            index = clang.cindex.Index.create()
-            tu = index.parse('tmp.cpp', args=['-std=c++11'], unsaved_files=[('tmp.cpp', code)])
-            tree = tu.cursor
-        return tree
-    except SyntaxError as e:
-        print(f"Invalid code: {e}")
-        return None
-
-def compare_asts(ast1, ast2):
-    normalized_code1 = normalize_code(ast1)
-    normalized_code2 = normalize_code(ast2)
-    similarity = Levenshtein.ratio(normalized_code1, normalized_code2)
-    return similarity
-
-def compare_java_asts(ast1, ast2):
-    num_nodes_ast1 = count_nodes(ast1)
-    num_nodes_ast2 = count_nodes(ast2)
-    similarity = min(num_nodes_ast1, num_nodes_ast2) / max(num_nodes_ast1, num_nodes_ast2)
-    return similarity
-
-def compare_cpp_asts(ast1, ast2):
-    num_nodes_ast1 = count_nodes_cpp(ast1)
-    num_nodes_ast2 = count_nodes_cpp(ast2)
-    similarity = min(num_nodes_ast1, num_nodes_ast2) / max(num_nodes_ast1, num_nodes_ast2)
-    return similarity
-
-def normalize_code(ast_tree):
-    if isinstance(ast_tree, ast.AST):
-        return ast.unparse(ast_tree)
-    elif isinstance(ast_tree, javalang.ast.Node):
-        return hierarchical_representation(ast_tree)
-    elif isinstance(ast_tree, clang.cindex.Cursor):
-        return hierarchical_representation_cpp(ast_tree)
-
-def hierarchical_representation(node, depth=0):
-    indent = '    ' * depth
-    result = f"{indent}{node.__class__.__name__}"  
-    
-    if isinstance(node, (javalang.ast.Node, javalang.tree.CompilationUnit)):
-        result += " {"
-        for attr_name, attr_value in vars(node).items():
-            if isinstance(attr_value, (list, javalang.ast.Node, javalang.tree.CompilationUnit)):
-                result += f"\n{indent}    {attr_name}:"
-                if isinstance(attr_value, list):
-                    for i, child in enumerate(attr_value):
-                        result += f"\n{indent}        [{i}] {hierarchical_representation(child, depth + 2)}"
-                else:
-                    result += f"\n{indent}        {hierarchical_representation(attr_value, depth + 2)}"
-            else:
-                result += f"\n{indent}    {attr_name}: {attr_value}"
-        result += f"\n{indent}}}"
-    elif isinstance(node, ast.AST): 
-        result = f"{indent}{node.__class__.__name__.upper()}"  
-        result += " {"
-        for attr_name, attr_value in ast.iter_fields(node):
-            result += f"\n{indent}    {attr_name}:"
-            if isinstance(attr_value, list):
-                for i, child in enumerate(attr_value):
-                    result += f"\n{indent}        [{i}] {hierarchical_representation(child, depth + 2)}"
-            else:
-                result += f"\n{indent}        {hierarchical_representation(attr_value, depth + 2)}"
-        result += f"\n{indent}}}"
-
-    return result
-
-def hierarchical_representation_cpp(cursor, depth=0):
-    indent = '    ' * depth
-    result = f"{indent}{cursor.kind.name}"
-
-    if cursor.kind.is_declaration():
-        result += f" ({cursor.displayname})"
-
-    for child in cursor.get_children():
-        result += f"\n{hierarchical_representation_cpp(child, depth + 1)}"
-
-    return result
-
-def count_nodes(ast_tree):
-    count = 0
-    for node in ast_tree:
-        count += 1
-        if isinstance(node, javalang.ast.Node):
-            count += count_nodes(node.children)
-    return count
-
-def count_nodes_cpp(cursor):
-    count = 1
-    for child in cursor.get_children():
-        count += count_nodes_cpp(child)
-    return count
-
-def calculate_similarity(code1, code2, language):
-    ast1 = generate_ast(preprocess_code(code1), language)
-    ast2 = generate_ast(preprocess_code(code2), language)
-    if ast1 is None or ast2 is None:
-        return "Invalid code"
-    if language == "Python":
-        similarity = compare_asts(ast1, ast2)
-    elif language == "Java":
-        similarity = compare_java_asts(ast1, ast2)
-    elif language == "C/C++":
-        similarity = compare_cpp_asts(ast1, ast2)
-    return similarity
-
 def similarity_formula(language):
+    if job_running():
+        return
     source_code = entry_1.get('1.0', tk.END)
-    entry_5.delete(*entry_5.get_children())   
+    if not result_items:
+        entry_5.delete(*entry_5.get_children())
+        result_sources.clear()
+        result_details.clear()
+    current = set(testing_names)
+    removed = [name for name in result_items if name not in current]
+    for name in removed:
+        row = result_items.pop(name)
+        entry_5.delete(row)
+        result_sources.pop(row, None)
+        result_details.pop(row, None)
+    forget(removed)
     entry_5["columns"] = ("File Name", "Plagiarism Percentage")
     entry_5.column("#0", width=0, stretch=tk.NO)
     entry_5.column("File Name", anchor=tk.CENTER, width=200)
@@ -159,12 +84,148 @@ def similarity_formula(language):
     entry_5.heading("File Name", text="File Name")
     entry_5.heading("Plagiarism Percentage", text="Plagiarism Percentage")
 
-    for index, file_path in enumerate(testing_files):
+    paths = list(testing_files)
+    def produce_rows(cancel):
+        for file_path, similarity in rescore(source_code, paths, language, current, cancel=cancel):
+            yield (file_path.split('/')[-1], format_similarity(similarity)), file_path, result_row(file_path, similarity)
+    start_job(produce_rows, lambda: count_sources(paths, language), keyed=True)
+
+def all_pairs_formula(language):
+    if job_running():
+        return
+    if len(testing_files) < 2:
+        messagebox.showwarning("Not enough files", "Please add at least two testing files.")
+        return
+    entry_5.delete(*entry_5.get_children())
+    result_sources.clear()
+    result_details.clear()
+    result_items.clear()
+    reset_session()
+    entry_5.heading("File Name", text="File Pair")
+    entry_5.heading("Plagiarism Percentage", text="Plagiarism Percentage")
+
+    paths = list(testing_files)
+    def produce_rows(cancel):
+        result = all_pairs(paths, language, cancel=cancel)
+        for file_path1, file_path2, similarity, shared, nodes1, nodes2 in result["top_pair_details"]:
+            yield ((f"{file_path1.split('/')[-1]} / {file_path2.split('/')[-1]}", format_similarity(similarity)), file_path1,
+                   pair_row(file_path1, file_path2, similarity, shared, nodes1, nodes2))
+        for file_path in result["invalid"]:
+            yield (file_path.split('/')[-1], "Invalid code"), file_path, pair_row(file_path, None, None, error="Invalid code")
+    start_job(produce_rows, None)
+
+def job_running():
+    if job_thread is not None and job_thread.is_alive():
+        messagebox.showwarning("Comparison running", "Please wait for the current comparison to finish or cancel it.")
+        return True
+    return False
+
+def start_job(produce_rows, count_total=None, keyed=False):
+    # count_total, if given, runs on a thread of its own and its result is
+    # posted to the queue, so the progress bar gets a length without the
+    # Tk thread or the comparison waiting on it.
+    global job_thread, cancel_event
+    cancel_event = threading.Event()
+    results = queue.Queue()
+
+    def work(cancel):
+        try:
+            for row in produce_rows(cancel):
+                results.put(row)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(None)
+
+    reset_stages()
+    job_thread = threading.Thread(target=work, args=(cancel_event,), daemon=True)
+    job_thread.start()
+    if count_total is not None:
+        threading.Thread(target=lambda: results.put(count_total()), daemon=True).start()
+    progress_bar.configure(mode="indeterminate", value=0)
+    progress_bar.start(10)
+    status_label.config(text="Comparing...")
+    entry_5.after(POLL_MS, drain_results, results, time.perf_counter(), 0, keyed)
+
+def drain_results(results, started, done, keyed=False):
+    if not entry_5.winfo_exists():
+        return
+    finished = False
+    rows = 0
+    while rows < RESULT_BATCH:
+        try:
+            item = results.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            finished = True
+            break
+        if isinstance(item, Exception):
+            messagebox.showerror("Comparison failed", str(item))
+            continue
+        if isinstance(item, int):
+            progress_bar.stop()
+            progress_bar.configure(mode="determinate", maximum=max(item, 1), value=done + rows)
+            continue
+        values, source_name, detail = item
+        with stage("display"):
+            if keyed and source_name in result_items:
+                row = result_items[source_name]
+                entry_5.item(row, values=values)
+            else:
+                row = entry_5.insert("", tk.END, values=values)
+                result_sources[row] = source_name
+                if keyed:
+                    result_items[source_name] = row
+        result_details[row] = detail
+        rows += 1
+    done += rows
+    elapsed = time.perf_counter() - started
+    if progress_bar["mode"] == "determinate":
+        progress_bar["value"] = done
+    rate = done / elapsed if elapsed > 0 else 0.0
+    if finished:
+        progress_bar.stop()
+        state = "Cancelled" if cancel_event.is_set() else "Done"
+        identical = counters.get("short_circuited", 0)
+        status_label.config(text=f"{state}: {done} rows in {elapsed:.1f}s" + (f", {identical} identical" if identical else ""))
+        write_configured_reports()
+        return
+    status_label.config(text=f"{done} rows, {rate:.1f} files/s")
+    entry_5.after(POLL_MS, drain_results, results, started, done, keyed)
+
+def cancel_job():
+    if job_thread is not None and job_thread.is_alive():
+        cancel_event.set()
+        status_label.config(text="Cancelling...")
+
+def set_lexer_mode(enabled):
+    plag_engine.LEXER_MODE = enabled
+
+def choose_starter_code(language):
+    # Starter code is subtracted from every submission before comparing.
+    # Cancelling the dialog removes it again.
+    if job_running():
+        return
+    file_types = []
+    if language == "Python":
+        file_types.append(("Python Files", "*.py"))
+    elif language == "Java":
+        file_types.append(("Java Files", "*.java"))
+    elif language == "C/C++":
+        file_types.append(("C/C++ Files", "*.c;*.cpp"))
+    file_paths = filedialog.askopenfilenames(title="Select Starter Code", filetypes=file_types)
+    sources = []
+    for file_path in file_paths:
         with open(file_path, 'r', encoding='utf-8') as file:
-            testing_code = file.read()
-        similarity = calculate_similarity(source_code, testing_code, language)
-        file_name = file_path.split('/')[-1]
-        entry_5.insert("", tk.END, values=(file_name, f"{similarity*100:.2f}%"))
+            sources.append(file.read())
+    plag_engine.TEMPLATE_SOURCES = tuple(sources)
+    status_label.config(text=f"Starter code: {len(sources)} files" if sources else "No starter code")
+
+def format_similarity(similarity):
+    if isinstance(similarity, str):
+        return similarity
+    return f"{similarity*100:.2f}%"
 
 def open_file(entry_1, entry_3, language):
     file_types = []
@@ -184,15 +245,7 @@ def open_file(entry_1, entry_3, language):
         entry_1.delete('1.0', tk.END)
         entry_1.insert(tk.END, file.read())
     source_code = entry_1.get('1.0', tk.END)
-    ast_tree = generate_ast(preprocess_code(source_code), language)
-    if ast_tree:
-        entry_3.delete('1.0', tk.END)
-        if language == "Python":
-            entry_3.insert(tk.END, ast.dump(ast_tree, indent=2))  
-        elif language == "C/C++":
-            entry_3.insert(tk.END, hierarchical_representation_cpp(ast_tree))  
-        else:
-            entry_3.insert(tk.END, hierarchical_representation(ast_tree))
+    offer_ast(entry_3, source_code, language)
 
 def add_testing_files(language):
     file_types = []
@@ -202,48 +255,154 @@ def add_testing_files(language):
         file_types.append(("Java Files", "*.java"))
     elif language == "C/C++":
         file_types.append(("C/C++ Files", "*.c;*.cpp"))
+    file_types.append(("Submission Archives", "*.zip;*.tar;*.tar.gz;*.tgz;*.tar.bz2;*.tar.xz"))
     file_paths = filedialog.askopenfilenames(title="Select Testing Files", filetypes=file_types)
+    # New selections are added to the list; scores of files already in it
+    # are kept until the next comparison shows whether they changed.
+    for file_path in file_paths:
+        if file_path in testing_files:
+            continue
+        testing_files.append(file_path)
+        if is_archive(file_path):
+            list_archive(file_path, language)
+        else:
+            testing_names.append(file_path)
+    show_file_list(language)
+
+def list_archive(file_path, language):
+    global listings_pending
+    def work():
+        try:
+            names = [f"{file_path}/{name}" for name in iter_member_names(file_path, language)]
+        except READ_ERRORS as e:
+            print(f"Unreadable archive {file_path}: {e}", file=sys.stderr)
+            names = []
+        archive_listings.put((file_path, names))
+
+    threading.Thread(target=work, daemon=True).start()
+    listings_pending += 1
+    if listings_pending == 1:
+        entry_4.after(POLL_MS, drain_listings, language)
+        status_label.config(text="Listing archives...")
+
+def drain_listings(language):
+    global listings_pending
+    if not entry_4.winfo_exists():
+        return
+    listed = False
+    while True:
+        try:
+            file_path, names = archive_listings.get_nowait()
+        except queue.Empty:
+            break
+        listings_pending -= 1
+        # Skip archives the list was cleared of while they were being read.
+        if file_path in testing_files:
+            testing_names.extend(names)
+            listed = True
+    if listed:
+        show_file_list(language)
+    if listings_pending:
+        entry_4.after(POLL_MS, drain_listings, language)
+    elif status_label.cget("text") == "Listing archives...":
+        status_label.config(text="")
+
+def clear_testing_files(language):
     testing_files.clear()
+    testing_names.clear()
+    show_file_list(language)
+
+def remove_testing_file(name, language):
+    testing_names.remove(name)
+    if name in testing_files:
+        testing_files.remove(name)
+    # Archives stay in testing_files while they still have members listed.
+    testing_files[:] = [path for path in testing_files if not is_archive(path)
+                        or any(listed.startswith(f"{path}/") for listed in testing_names)]
+    show_file_list(language)
+
+def show_file_list(language):
     entry_4.delete('1.0', tk.END)
     entry_2.delete('1.0', tk.END)
-    for file_path in file_paths:
-        testing_files.append(file_path)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            entry_4.tag_configure('file_name', foreground='green', font=('Helvetica', 10, 'bold'))
-            entry_4.insert(tk.END, "------------------------------\n")
-            entry_4.insert(tk.END, f"File Name: {file_path.split('/')[-1]}\n", 'file_name')
-            entry_4.insert(tk.END, "------------------------------\n")
-            code = file.read()
-            entry_4.insert(tk.END, code)
-            entry_4.insert(tk.END, "\n")
-            ast_tree = generate_ast(preprocess_code(code), language)
-            if ast_tree:
-                entry_2.tag_configure('file_name', foreground='green', font=('Helvetica', 10, 'bold'))
-                entry_2.insert(tk.END, "------------------------------\n")
-                entry_2.insert(tk.END, f"File Name: {file_path.split('/')[-1]}\n", 'file_name')
-                entry_2.insert(tk.END, "------------------------------\n")
-                if language == "Python":
-                    entry_2.insert(tk.END, ast.dump(ast_tree, indent=2))  
-                elif language == "C/C++":
-                    entry_2.insert(tk.END, hierarchical_representation_cpp(ast_tree))  
-                else:
-                    entry_2.insert(tk.END, hierarchical_representation(ast_tree))  
-                entry_2.insert(tk.END, "\n\n")
-
+    entry_4.tag_configure('file_name', foreground='green', font=('Helvetica', 10, 'bold'))
+    entry_4.tag_configure('file_link', foreground='blue', underline=True)
+    entry_4.insert(tk.END, f"{len(testing_names)} files - click one to view it\n", 'file_name')
+    entry_4.insert(tk.END, "".join(f"{name.split('/')[-1]}\n" for name in testing_names), 'file_link')
+    entry_4.tag_bind('file_link', '<Button-1>', lambda event: open_listed_file(event, language))
+
+def open_listed_file(event, language):
+    line = int(entry_4.index(f"@{event.x},{event.y}").split('.')[0])
+    # Line 1 is the heading; file names start on line 2.
+    if 2 <= line < len(testing_names) + 2:
+        show_file(testing_names[line - 2], language)
+
+def show_file(name, language):
+    code = read_source_by_name(name)
+    if code is None:
+        messagebox.showwarning("Unreadable file", f"Could not read {name}.")
+        return
+    entry_4.delete('1.0', tk.END)
+    entry_2.delete('1.0', tk.END)
+    entry_4.tag_configure('back_link', foreground='blue', underline=True)
+    entry_4.tag_bind('back_link', '<Button-1>', lambda event: show_file_list(language))
+    entry_4.insert(tk.END, "<< All files", 'back_link')
+    if name in testing_names:
+        entry_4.tag_configure('remove_link', foreground='red', underline=True)
+        entry_4.tag_bind('remove_link', '<Button-1>', lambda event: remove_testing_file(name, language))
+        entry_4.insert(tk.END, "    Remove this file", 'remove_link')
+    entry_4.insert(tk.END, "\n")
+    entry_4.insert(tk.END, "------------------------------\n")
+    entry_4.insert(tk.END, f"File Name: {name.split('/')[-1]}\n", 'file_name')
+    entry_4.insert(tk.END, "------------------------------\n")
+    entry_4.insert(tk.END, code)
+    offer_ast(entry_2, code, language)
+
+def offer_ast(pane, code, language):
+    # Comparisons never need the readable dump, so it is only built when
+    # someone asks to see it.
+    pane.delete('1.0', tk.END)
+    pane.tag_configure('ast_link', foreground='blue', underline=True)
+    pane.tag_bind('ast_link', '<Button-1>', lambda event: show_ast_page(pane, code, language, 0))
+    pane.insert(tk.END, "Show AST", 'ast_link')
+
+def show_ast_page(pane, code, language, page):
+    entry = get_dump(code, language)
+    if entry is None:
+        pane.delete('1.0', tk.END)
+        pane.insert(tk.END, "Invalid code")
+        return
+    text, more = dump_page(entry, page)
+    if page == 0:
+        pane.delete('1.0', tk.END)
+    else:
+        pane.delete('more_link.first', 'more_link.last')
+    pane.insert(tk.END, text)
+    if more:
+        pane.tag_configure('more_link', foreground='blue', underline=True)
+        pane.tag_bind('more_link', '<Button-1>', lambda event: show_ast_page(pane, code, language, page + 1))
+        pane.insert(tk.END, "\n... Show more", 'more_link')
+
+def show_selected_result(language):
+    selection = entry_5.selection()
+    if selection and selection[0] in result_sources:
+        show_file(result_sources[selection[0]], language)
 
 def save_to_excel():
-    data = []
-    for item in entry_5.get_children():
-        values = entry_5.item(item, 'values')
-        data.append(values)
-    if not data:
+    rows = [row for row in entry_5.get_children() if row in result_details]
+    if not rows:
         messagebox.showwarning("No Data", "No data to save.")
         return
-    file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel Files", "*.xlsx")])
-    if file_path:
-        df = pd.DataFrame(data, columns=["File Name", "Plagiarism Percentage"])
-        df.to_excel(file_path, index=False)
-        save_label.config(text="File Saved Successfully", fg="green")
+    file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[
+        ("Excel Files", "*.xlsx"), ("CSV Files", "*.csv"), ("Parquet Files", "*.parquet"), ("JSON Lines", "*.jsonl")])
+    if not file_path:
+        return
+    columns = ALL_PAIRS_COLUMNS if "file1" in result_details[rows[0]] else COMPARE_COLUMNS
+    try:
+        written = export_rows((result_details[row] for row in rows), columns, file_path, format_for_path(file_path) or "xlsx")
+    except (OSError, RuntimeError) as e:
+        messagebox.showerror("Export failed", str(e))
+        return
+    save_label.config(text=f"Saved {len(written)} file(s)" if len(written) > 1 else "File Saved Successfully", fg="green")
 
 def open_back_page(language,parent=None):
     global entry_1
@@ -260,15 +419,26 @@ def open_back_page(language,parent=None):
     def similarity_formula_wrapper():
         similarity_formula(language)
 
+    def clear_testing_files_wrapper():
+        clear_testing_files(language)
+
+    def all_pairs_formula_wrapper():
+        all_pairs_formula(language)
+
+    def choose_starter_code_wrapper():
+        choose_starter_code(language)
+
     def save_to_excel_wrapper():
         save_to_excel()
 
     def back_to_front_page():
+        cancel_job()
         window.destroy()
         if parent:
             parent.deiconify()
 
     def exit_program():
+        cancel_job()
         window.destroy()
 
     if parent:
@@ -429,6 +599,7 @@ def open_back_page(language,parent=None):
     entry_5.heading("File Name", text="File Name")
     entry_5.heading("Plagiarism Percentage", text="Plagiarism Percentage")
     entry_5.place(x=899.1290283203125, y=109.0, width=367.74176025390625, height=286.9287109375)
+    entry_5.bind("<<TreeviewSelect>>", lambda event: show_selected_result(language))
 
 
     button_image_1 = PhotoImage(
@@ -510,6 +681,72 @@ def open_back_page(language,parent=None):
         height=51.0
     )
 
+    button_7 = Button(window,
+        text="All Pairs",
+        borderwidth=0,
+        command=lambda:all_pairs_formula_wrapper(),
+        relief="flat"
+    )
+    button_7.place(
+        x=1190.0,
+        y=432.0,
+        width=95.0,
+        height=30.0
+    )
+
+    button_8 = Button(window,
+        text="Cancel",
+        borderwidth=0,
+        command=lambda:cancel_job(),
+        relief="flat"
+    )
+    button_8.place(
+        x=1190.0,
+        y=470.0,
+        width=95.0,
+        height=30.0
+    )
+
+    button_9 = Button(window,
+        text="Clear Files",
+        borderwidth=0,
+        command=lambda:clear_testing_files_wrapper(),
+        relief="flat"
+    )
+    button_9.place(
+        x=1190.0,
+        y=508.0,
+        width=95.0,
+        height=30.0
+    )
+
+    lexer_mode = tk.BooleanVar(window, value=plag_engine.LEXER_MODE)
+    lexer_check = tk.Checkbutton(window,
+        text="Tokens only",
+        variable=lexer_mode,
+        command=lambda:set_lexer_mode(lexer_mode.get()),
+        bg="#FFFFFF"
+    )
+    lexer_check.place(
+        x=1190.0,
+        y=546.0,
+        width=95.0,
+        height=30.0
+    )
+
+    button_10 = Button(window,
+        text="Starter Code",
+        borderwidth=0,
+        command=lambda:choose_starter_code_wrapper(),
+        relief="flat"
+    )
+    button_10.place(
+        x=1190.0,
+        y=584.0,
+        width=95.0,
+        height=30.0
+    )
+
     button_image_6 = PhotoImage(
         file=relative_to_assets("b6.png"))
     button_6 = Button(window,
@@ -546,6 +783,15 @@ def open_back_page(language,parent=None):
     scrollbar_5.place(x=1270, y=109, height=286)
     entry_5.config(yscrollcommand=scrollbar_5.set)
 
+    global progress_bar
+    progress_bar = ttk.Progressbar(window, orient="horizontal", mode="determinate")
+    progress_bar.place(x=899, y=399, width=368, height=18)
+
+    global status_label
+    status_label = tk.Label(window, text="", fg="black")
+    # Own row under the save message, just above the results table.
+    status_label.place(x=899, y=88)
+
     global save_label
     save_label = tk.Label(window, text="", fg="green")
     save_label.place(x=1030, y=70) 
@@ -635,4 +881,5 @@ def open_front_page():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     open_front_page()
@@ -0,0 +1,111 @@
+import heapq
+from collections import defaultdict
+from itertools import combinations
+from plag_engine import compare_fingerprints
+from plag_batch import fingerprint_files, is_cancelled
+from plag_profile import count
+
+# Fingerprints found in more than this share of the submissions are
+# common idioms, not evidence of copying, and are left out of pairing.
+MAX_DOCUMENT_FREQUENCY = 0.05
+# Small batches always pair on buckets up to this size.
+MIN_BUCKET_LIMIT = 20
+# A pair goes on to the detailed comparison if it shares at least this
+# many fingerprints, or this fraction of the smaller submission's. The
+# count admits a large block copied into a much bigger file; a handful of
+# shared fingerprints is common between unrelated submissions.
+MIN_SHARED_FINGERPRINTS = 30
+MIN_OVERLAP = 0.2
+TOP_K = 100
+
+
+def build_fingerprint_index(fingerprints):
+    index = defaultdict(list)
+    for doc_id, fingerprint in enumerate(fingerprints):
+        for value in fingerprint["winnow"]:
+            index[value].append(doc_id)
+    return index
+
+def bucket_limit(count):
+    return max(MIN_BUCKET_LIMIT, int(count * MAX_DOCUMENT_FREQUENCY))
+
+def candidate_pairs(index, count, limit=None):
+    if limit is None:
+        limit = bucket_limit(count)
+    shared = defaultdict(int)
+    for postings in index.values():
+        if len(postings) < 2 or len(postings) > limit:
+            continue
+        for pair in combinations(postings, 2):
+            shared[pair] += 1
+    return shared
+
+def is_candidate(shared, fingerprint1, fingerprint2):
+    smaller = min(len(fingerprint1["winnow"]), len(fingerprint2["winnow"]))
+    return shared >= MIN_SHARED_FINGERPRINTS or shared / smaller >= MIN_OVERLAP
+
+def duplicate_clusters(fingerprints):
+    # Submissions with the same canonical hash, in one pass over the hashes.
+    # Empty ones, such as untouched starter code, match nothing.
+    buckets = defaultdict(list)
+    for doc_id, fingerprint in enumerate(fingerprints):
+        buckets[fingerprint["hash"] if fingerprint["nodes"] else doc_id].append(doc_id)
+    return list(buckets.values())
+
+def similarity_matrix(fingerprints, threshold=None, cancel=None, shared_counts=None):
+    # shared_counts, when given, is filled with the number of fingerprints
+    # each kept pair has in common. Duplicates are scored 1.0 among
+    # themselves without comparing, and only one of each cluster takes part
+    # in pairing; its scores are copied to the rest of the cluster.
+    matrix = {}
+    clusters = duplicate_clusters(fingerprints)
+    for cluster in clusters:
+        for pair in combinations(cluster, 2):
+            matrix[pair] = 1.0
+            if shared_counts is not None:
+                shared_counts[pair] = len(fingerprints[pair[0]]["winnow"])
+        count("short_circuited", len(cluster) * (len(cluster) - 1) // 2)
+    representatives = [fingerprints[cluster[0]] for cluster in clusters]
+    index = build_fingerprint_index(representatives)
+    for (a, b), shared in candidate_pairs(index, len(representatives)).items():
+        if is_cancelled(cancel):
+            break
+        if is_candidate(shared, representatives[a], representatives[b]):
+            similarity = compare_fingerprints(representatives[a], representatives[b], threshold)
+            if threshold and similarity < threshold:
+                continue
+            for i in clusters[a]:
+                for j in clusters[b]:
+                    pair = (i, j) if i < j else (j, i)
+                    matrix[pair] = similarity
+                    if shared_counts is not None:
+                        shared_counts[pair] = shared
+            count("short_circuited", len(clusters[a]) * len(clusters[b]) - 1)
+    return matrix
+
+def top_pair_details(matrix, shared_counts, fingerprints, names, top_k=TOP_K):
+    best = heapq.nlargest(top_k, matrix.items(), key=lambda item: item[1])
+    return [(names[i], names[j], similarity, shared_counts.get((i, j)), fingerprints[i]["nodes"], fingerprints[j]["nodes"])
+            for (i, j), similarity in best]
+
+def all_pairs(file_paths, language, top_k=TOP_K, workers=None, threshold=None, cancel=None):
+    names = []
+    fingerprints = []
+    invalid = []
+    for file_path, fingerprint in fingerprint_files(file_paths, language, workers, cancel):
+        if fingerprint is None:
+            invalid.append(file_path)
+            continue
+        names.append(file_path)
+        fingerprints.append(fingerprint)
+    shared_counts = {}
+    matrix = similarity_matrix(fingerprints, threshold, cancel, shared_counts)
+    details = top_pair_details(matrix, shared_counts, fingerprints, names, top_k)
+    return {
+        "files": names,
+        "invalid": invalid,
+        "matrix": matrix,
+        "top_pairs": [detail[:3] for detail in details],
+        "top_pair_details": details,
+        "duplicate_clusters": [[names[i] for i in cluster] for cluster in duplicate_clusters(fingerprints) if len(cluster) > 1],
+    }
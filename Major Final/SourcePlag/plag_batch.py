@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from plag_engine import compare_to_reference, engine_settings, apply_engine_settings
+import plag_cache
+from plag_cache import cached_fingerprint
+from plag_profile import drain_profile, merge_profile, file_stage, profiling_flags, set_profiling_flags, reset_stages
+from plag_ingest import iter_sources
+
+# Number of worker processes used for a batch; None means one per CPU.
+BATCH_WORKERS = None
+# How many files each worker may have queued ahead of it.
+PENDING_PER_WORKER = 4
+
+worker_reference = None
+worker_threshold = None
+
+
+def compare_source(reference, source, language, threshold=None):
+    name, code = source
+    if code is None:
+        return name, "Unreadable file"
+    with file_stage(name):
+        return name, compare_to_reference(reference, cached_fingerprint(code, language), threshold)
+
+def install_reference(reference, threshold=None):
+    global worker_reference, worker_threshold
+    worker_reference = reference
+    worker_threshold = threshold
+
+def compare_source_in_worker(source, language):
+    return compare_source(worker_reference, source, language, worker_threshold)
+
+def profiled_call(function, item, language, settings):
+    # Stage timings and counters live in each worker process; ship them
+    # back with every result so the parent's report covers the whole run.
+    # The parent's profiling, engine and cache switches travel with each
+    # item, since spawned workers don't see them being set at runtime.
+    flags, engine, cache_enabled = settings
+    set_profiling_flags(flags)
+    apply_engine_settings(engine)
+    plag_cache.CACHE_ENABLED = cache_enabled
+    return function(item, language), drain_profile()
+
+def start_worker(initializer, initargs):
+    # Forked workers inherit the parent's stage totals and counters; start
+    # from zero so merging their reports doesn't count the parent's twice.
+    reset_stages()
+    if initializer is not None:
+        initializer(*initargs)
+
+def resolve_workers(workers=None):
+    if workers is None:
+        workers = BATCH_WORKERS
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+def is_cancelled(cancel):
+    return cancel is not None and cancel.is_set()
+
+def map_unordered(function, items, language, workers=None, initializer=None, initargs=(), cancel=None):
+    workers = resolve_workers(workers)
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            if is_cancelled(cancel):
+                return
+            yield function(item, language)
+        return
+
+    # Only a bounded window of items is read ahead, so memory stays flat
+    # however long the input stream is.
+    max_pending = workers * PENDING_PER_WORKER
+    settings = (profiling_flags(), engine_settings(), plag_cache.CACHE_ENABLED)
+    remaining = iter(items)
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(initializer, initargs)) as executor:
+        pending = set()
+        for item in remaining:
+            pending.add(executor.submit(profiled_call, function, item, language, settings))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, profile = future.result()
+                merge_profile(profile)
+                yield result
+            if is_cancelled(cancel):
+                # Queued files are dropped; only the ones already being
+                # parsed are waited for when the pool shuts down.
+                for future in pending:
+                    future.cancel()
+                return
+            for item in remaining:
+                pending.add(executor.submit(profiled_call, function, item, language, settings))
+                if len(pending) >= max_pending:
+                    break
+
+def run_batch(source_code, paths, language, workers=None, threshold=None, cancel=None):
+    reference = cached_fingerprint(source_code, language)
+    sources = iter_sources(paths, language)
+    return map_unordered(compare_source_in_worker, sources, language, workers, install_reference, (reference, threshold), cancel)
+
+def fingerprint_source(source, language):
+    name, code = source
+    if code is None:
+        return name, None
+    with file_stage(name):
+        return name, cached_fingerprint(code, language)
+
+def fingerprint_files(paths, language, workers=None, cancel=None):
+    return map_unordered(fingerprint_source, iter_sources(paths, language), language, workers, cancel=cancel)
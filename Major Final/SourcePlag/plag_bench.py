@@ -0,0 +1,178 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import plag_cache
+import plag_engine
+from plag_engine import prepare_reference
+from plag_allpairs import similarity_matrix
+from plag_profile import stage_report, reset_stages
+from plag_synth import VARIANT_EDITS, generate_corpus, write_corpus
+
+LANGUAGES = {
+    "python": "Python",
+    "java": "Java",
+    "cpp": "C/C++",
+}
+DEFAULT_SIZE = 100
+DETECTION_THRESHOLD = 0.8
+# A run regresses when a timing grows by more than this share of the
+# baseline, or precision or recall drops by more than QUALITY_TOLERANCE.
+TIME_TOLERANCE = 0.2
+QUALITY_TOLERANCE = 0.02
+TIMED_METRICS = ("parse_seconds", "compare_seconds")
+QUALITY_METRICS = ("precision", "recall")
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def detection_scores(submissions, fingerprints, matrix, threshold):
+    families = [submission["family"] for submission in submissions]
+    expected = {(i, j) for i, j in combinations(range(len(submissions)), 2) if families[i] == families[j]}
+    valid = {i for i, fingerprint in enumerate(fingerprints) if fingerprint is not None}
+    expected = {pair for pair in expected if pair[0] in valid and pair[1] in valid}
+    flagged = {pair for pair, similarity in matrix.items() if similarity >= threshold}
+    hits = len(expected & flagged)
+    # Which hiding edits the detector misses: recall over the expected pairs
+    # where either side had the edit applied.
+    by_edit = {}
+    for edit in VARIANT_EDITS:
+        edited = {(i, j) for i, j in expected if edit in submissions[i]["edits"] or edit in submissions[j]["edits"]}
+        if edited:
+            by_edit[edit] = len(edited & flagged) / len(edited)
+    return {
+        "expected_pairs": len(expected),
+        "flagged_pairs": len(flagged),
+        "precision": hits / len(flagged) if flagged else 1.0,
+        "recall": hits / len(expected) if expected else 1.0,
+        "recall_by_edit": by_edit,
+    }
+
+def bench_language(language, size, seed, threshold=DETECTION_THRESHOLD):
+    submissions = generate_corpus(language, size, seed)
+    reset_stages()
+    start = time.perf_counter()
+    fingerprints = [prepare_reference(submission["code"], language) for submission in submissions]
+    parse_seconds = time.perf_counter() - start
+
+    # The matrix works on positions in its input list; map them back to
+    # positions in submissions so invalid files don't shift the pairs.
+    positions = [i for i, fingerprint in enumerate(fingerprints) if fingerprint is not None]
+    start = time.perf_counter()
+    valid_matrix = similarity_matrix([fingerprints[i] for i in positions])
+    compare_seconds = time.perf_counter() - start
+    matrix = {(positions[i], positions[j]): similarity for (i, j), similarity in valid_matrix.items()}
+
+    result = {
+        "files": size,
+        "invalid": size - len(positions),
+        "parse_seconds": parse_seconds,
+        "compare_seconds": compare_seconds,
+        "compared_pairs": len(valid_matrix),
+        "peak_rss_kb": peak_rss_kb(),
+        "threshold": threshold,
+        "stages": stage_report(),
+    }
+    result.update(detection_scores(submissions, fingerprints, matrix, threshold))
+    return result
+
+def bench_in_process(language, size, seed, threshold, lexer):
+    plag_cache.CACHE_ENABLED = False
+    plag_engine.LEXER_MODE = lexer
+    return bench_language(language, size, seed, threshold)
+
+def bench_in_subprocess(language, size, seed, threshold):
+    # ru_maxrss is the peak over a process's whole life, so each language
+    # runs in a fresh process to keep earlier ones out of its figure.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(bench_in_process, language, size, seed, threshold, plag_engine.LEXER_MODE).result()
+
+def run_benchmarks(languages, size=DEFAULT_SIZE, seed=0, threshold=DETECTION_THRESHOLD):
+    results = {}
+    for language in languages:
+        try:
+            results[language] = bench_in_subprocess(language, size, seed, threshold)
+        except ImportError as e:
+            print(f"Skipping {language}: {e}", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "seed": seed,
+        "lexer": plag_engine.LEXER_MODE,
+        "languages": results,
+    }
+
+def find_regressions(report, baseline):
+    regressions = []
+    for language, result in report["languages"].items():
+        previous = baseline.get("languages", {}).get(language)
+        if previous is None:
+            continue
+        for metric in TIMED_METRICS:
+            if result[metric] > previous[metric] * (1 + TIME_TOLERANCE):
+                regressions.append(f"{language} {metric}: {previous[metric]:.3f}s -> {result[metric]:.3f}s")
+        for metric in QUALITY_METRICS:
+            if result[metric] < previous[metric] - QUALITY_TOLERANCE:
+                regressions.append(f"{language} {metric}: {previous[metric]:.3f} -> {result[metric]:.3f}")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sourceplag-bench", description="SourcePlag benchmarks on synthetic submissions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate corpora, time parsing and comparison, and score detection")
+    run.add_argument("--language", dest="languages", action="append", choices=sorted(LANGUAGES),
+                     help="language to benchmark; repeat for several (default: all)")
+    run.add_argument("--size", type=int, default=DEFAULT_SIZE, help="submissions per language")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--threshold", type=float, default=DETECTION_THRESHOLD, help="similarity at which a pair is flagged")
+    run.add_argument("--lexer", action="store_true", help="benchmark the token-stream mode instead of syntax trees")
+    run.add_argument("--save", help="write the report to this file as a baseline")
+    run.add_argument("--baseline", help="compare against a saved baseline; exit 1 on regression")
+
+    generate = commands.add_parser("generate", help="write a synthetic corpus and its truth.json to a directory")
+    generate.add_argument("--language", required=True, choices=sorted(LANGUAGES))
+    generate.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("directory")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "generate":
+        write_corpus(generate_corpus(LANGUAGES[args.language], args.size, args.seed), args.directory)
+        return 0
+
+    # Cached fingerprints would make the parse timings meaningless.
+    plag_cache.CACHE_ENABLED = False
+    plag_engine.LEXER_MODE = args.lexer
+    languages = [LANGUAGES[name] for name in (args.languages or sorted(LANGUAGES))]
+    report = run_benchmarks(languages, args.size, args.seed, args.threshold)
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = find_regressions(report, json.load(file))
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
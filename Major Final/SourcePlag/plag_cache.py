@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+from array import array
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from plag_engine import NORMALIZER_VERSION, parser_version, preprocess_code, prepare_reference, fingerprint_code, subtract_templates
+from plag_profile import stage
+
+CACHE_PATH = Path(os.environ.get("SOURCEPLAG_CACHE", Path.home() / ".sourceplag" / "fingerprints.sqlite3"))
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_ENABLED = os.environ.get("SOURCEPLAG_NO_CACHE") is None
+# Size checks scan the whole table, so only run one every few inserts.
+EVICT_EVERY = 64
+
+# One connection per thread: a sqlite3 connection only works in the
+# thread that opened it, and the GUI runs each job on a new thread. The
+# process that opened it is kept too, as connections must not be used
+# across fork() and a forked worker opens its own.
+local = threading.local()
+# Connections inherited from the parent are kept here, never used or
+# closed: SQLite state copied by fork() must be left alone in the child.
+inherited_connections = []
+stores_since_evict = 0
+
+
+def content_digest(code):
+    return hashlib.sha256(preprocess_code(code).encode('utf-8')).hexdigest()
+
+def encode_fingerprint(fingerprint):
+    # Token arrays are stored as base64 of their raw bytes rather than as
+    # JSON number lists, which would be several times larger.
+    encoded = {}
+    for key, value in fingerprint.items():
+        if isinstance(value, array):
+            value = {"array": value.typecode, "data": base64.b64encode(value.tobytes()).decode('ascii')}
+        encoded[key] = value
+    return json.dumps(encoded)
+
+def decode_fingerprint(data):
+    fingerprint = json.loads(data)
+    for key, value in fingerprint.items():
+        if isinstance(value, dict) and "array" in value:
+            decoded = array(value["array"])
+            decoded.frombytes(base64.b64decode(value["data"]))
+            fingerprint[key] = decoded
+    return fingerprint
+
+def open_cache():
+    if getattr(local, "pid", None) != os.getpid():
+        if getattr(local, "connection", None) is not None:
+            inherited_connections.append(local.connection)
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(CACHE_PATH), timeout=30)
+        try:
+            setup_cache(db)
+        except sqlite3.Error:
+            db.close()
+            raise
+        local.connection = db
+        local.pid = os.getpid()
+    return local.connection
+
+def setup_cache(db):
+    # Several workers can open a new cache file at once. Only keep a
+    # connection once its setup has committed, or the next call would use
+    # a half-initialised one.
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""CREATE TABLE IF NOT EXISTS fingerprints (
+        digest TEXT NOT NULL,
+        language TEXT NOT NULL,
+        parser_version TEXT NOT NULL,
+        normalizer_version INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (digest, language, parser_version))""")
+    db.execute("CREATE INDEX IF NOT EXISTS fingerprints_last_used ON fingerprints (last_used)")
+    db.execute("DELETE FROM fingerprints WHERE normalizer_version != ?", (NORMALIZER_VERSION,))
+    db.commit()
+
+def abandon_transaction():
+    # A failed write leaves its transaction open, and every later write on
+    # the connection would fail behind it.
+    if getattr(local, "pid", None) == os.getpid():
+        try:
+            local.connection.rollback()
+        except sqlite3.Error:
+            pass
+
+def lookup_fingerprint(digest, language):
+    try:
+        db = open_cache()
+        key = (digest, language, parser_version(language))
+        # An older process still running can write rows after the stale
+        # ones were deleted on open.
+        row = db.execute("SELECT fingerprint FROM fingerprints WHERE digest = ? AND language = ? AND parser_version = ? AND normalizer_version = ?",
+                         key + (NORMALIZER_VERSION,)).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE fingerprints SET last_used = ? WHERE digest = ? AND language = ? AND parser_version = ?", (time.time(),) + key)
+        db.commit()
+        return decode_fingerprint(row[0])
+    except (sqlite3.Error, OSError) as e:
+        abandon_transaction()
+        print(f"Fingerprint cache unavailable: {e}", file=sys.stderr)
+        return None
+
+def store_fingerprint(digest, language, fingerprint):
+    global stores_since_evict
+    data = encode_fingerprint(fingerprint)
+    try:
+        db = open_cache()
+        db.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (digest, language, parser_version(language), NORMALIZER_VERSION, data, len(data), time.time()))
+        db.commit()
+        stores_since_evict += 1
+        if stores_since_evict >= EVICT_EVERY:
+            evict_to_size()
+    except (sqlite3.Error, OSError) as e:
+        abandon_transaction()
+        print(f"Fingerprint cache unavailable: {e}", file=sys.stderr)
+
+def evict_to_size(max_bytes=None):
+    global stores_since_evict
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    db = open_cache()
+    stores_since_evict = 0
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM fingerprints").fetchone()[0]
+    if total <= max_bytes:
+        return
+    # Evict down to 90% so the next few inserts don't trigger another pass.
+    excess = total - int(max_bytes * 0.9)
+    # Read every row before deleting: an unfinished SELECT keeps its
+    # snapshot, and in WAL mode writing on top of a stale one fails at once.
+    rows = db.execute("SELECT rowid, size FROM fingerprints ORDER BY last_used").fetchall()
+    doomed = []
+    for rowid, size in rows:
+        if excess <= 0:
+            break
+        doomed.append((rowid,))
+        excess -= size
+    db.executemany("DELETE FROM fingerprints WHERE rowid = ?", doomed)
+    db.commit()
+
+def clear_cache():
+    db = open_cache()
+    db.execute("DELETE FROM fingerprints")
+    db.commit()
+
+def cached_fingerprint(code, language):
+    if not CACHE_ENABLED:
+        return prepare_reference(code, language)
+    # Entries hold the full fingerprint; templates are subtracted on the way out.
+    with stage("cache_lookup"):
+        digest = content_digest(code)
+        fingerprint = lookup_fingerprint(digest, language)
+    if fingerprint is None:
+        fingerprint = fingerprint_code(code, language)
+        if fingerprint is not None:
+            with stage("cache_store"):
+                store_fingerprint(digest, language, fingerprint)
+    return subtract_templates(fingerprint, language)
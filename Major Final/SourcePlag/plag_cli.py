@@ -0,0 +1,272 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import plag_cache
+import plag_engine
+from plag_batch import run_batch
+from plag_allpairs import all_pairs, TOP_K
+from plag_export import WRITERS, FILE_WRITERS, COMPARE_COLUMNS, ALL_PAIRS_COLUMNS, COPIED_FUNCTION_COLUMNS, FUNCTION_MATCH_COLUMNS
+from plag_export import result_row, pair_row, write_rows, export_rows, format_for_path
+from plag_ingest import read_file_source
+from plag_profile import counters, stage_report, enable_profiling, write_report, write_chrome_trace, write_configured_reports
+
+LANGUAGES = {
+    "python": "Python",
+    "java": "Java",
+    "c": "C/C++",
+    "cpp": "C/C++",
+    "c++": "C/C++",
+}
+CORPUS_COLUMNS = ["file", "similarity"]
+
+
+def compare_rows(reference_path, paths, language, workers=None, threshold=None):
+    source_code = read_file_source(reference_path)
+    if source_code is None:
+        raise SystemExit(f"Cannot read reference {reference_path}")
+    for name, similarity in run_batch(source_code, paths, language, workers, threshold):
+        yield result_row(name, similarity)
+
+def all_pairs_rows(paths, language, top_k=TOP_K, workers=None, threshold=None):
+    result = all_pairs(paths, language, top_k, workers, threshold)
+    for file1, file2, similarity, shared, nodes1, nodes2 in result["top_pair_details"]:
+        yield pair_row(file1, file2, similarity, shared, nodes1, nodes2)
+    for name in result["invalid"]:
+        yield pair_row(name, None, None, error="Invalid code")
+
+def corpus_query_rows(reference_path, corpus_path, language, top_k):
+    from plag_corpus import load_corpus, score_corpus
+    source_code = read_file_source(reference_path)
+    if source_code is None:
+        raise SystemExit(f"Cannot read reference {reference_path}")
+    corpus = load_corpus(corpus_path)
+    check_corpus(corpus, corpus_path, language)
+    for name, similarity in score_corpus(corpus, plag_cache.cached_fingerprint(source_code, language), top_k):
+        yield {"file": name, "similarity": similarity}
+
+def check_corpus(corpus, corpus_path, language):
+    if corpus["language"] != language:
+        raise SystemExit(f"Corpus {corpus_path} holds {corpus['language']} submissions, not {language}")
+    if corpus["parser"] != plag_engine.parser_version(language):
+        raise SystemExit(f"Corpus {corpus_path} was built with {corpus['parser'] or 'an unrecorded parser'}, "
+                         f"not {plag_engine.parser_version(language)} (see --lexer)")
+    if corpus["templates"] != plag_engine.template_digest():
+        raise SystemExit(f"Corpus {corpus_path} was built with different starter code (--template)")
+
+def build_corpus_file(paths, corpus_path, language, workers=None):
+    from plag_corpus import build_corpus, extend_corpus, load_corpus, save_corpus
+    from plag_batch import fingerprint_files
+    if os.path.exists(corpus_path):
+        corpus = load_corpus(corpus_path)
+        check_corpus(corpus, corpus_path, language)
+        extend_corpus(corpus, fingerprint_files(paths, language, workers))
+    else:
+        corpus = build_corpus(paths, language, workers)
+    save_corpus(corpus, corpus_path)
+    print(f"{len(corpus['names'])} submissions in {corpus_path}", file=sys.stderr)
+
+def copied_function_rows(paths, language, min_nodes, workers=None):
+    from plag_merkle import copied_functions
+    from plag_batch import fingerprint_files
+    names = []
+    fingerprints = []
+    for name, fingerprint in fingerprint_files(paths, language, workers):
+        if fingerprint is None:
+            print(f"Skipping {name}: invalid code", file=sys.stderr)
+            continue
+        names.append(name)
+        fingerprints.append(fingerprint)
+    return copied_functions(names, fingerprints, min_nodes)
+
+def function_match_rows(paths, language, top_k, threshold=None, workers=None):
+    from plag_functions import function_matches
+    from plag_batch import fingerprint_files
+    return function_matches(fingerprint_files(paths, language, workers), threshold, top_k)
+
+def open_index_file(index_path, language, rebuild=False):
+    from plag_lsh import open_index
+    try:
+        return open_index(index_path, language, rebuild)
+    except RuntimeError as e:
+        raise SystemExit(f"{e}; index-add --rebuild clears it")
+
+def index_add(paths, index_path, language, workers=None, rebuild=False):
+    from plag_lsh import insert_submissions
+    from plag_batch import fingerprint_files
+    db = open_index_file(index_path, language, rebuild)
+    added = insert_submissions(db, fingerprint_files(paths, language, workers), language)
+    print(f"Indexed {added} submissions in {index_path}", file=sys.stderr)
+
+def index_query_rows(reference_path, index_path, language, top_k, threshold=None):
+    from plag_lsh import query_index
+    db = open_index_file(index_path, language)
+    source_code = read_file_source(reference_path)
+    if source_code is None:
+        raise SystemExit(f"Cannot read reference {reference_path}")
+    fingerprint = plag_cache.cached_fingerprint(source_code, language)
+    for name, similarity in query_index(db, fingerprint, language, top_k, threshold):
+        yield {"file": name, "similarity": similarity}
+
+def index_recall(paths, index_path, language, top_k, threshold=None, workers=None):
+    from plag_lsh import measure_recall, RECALL_THRESHOLD
+    from plag_batch import fingerprint_files
+    if threshold is None:
+        threshold = RECALL_THRESHOLD
+    db = open_index_file(index_path, language)
+    report = measure_recall(db, fingerprint_files(paths, language, workers), language, top_k, threshold)
+    print(json.dumps(report, indent=2))
+
+def read_templates(paths):
+    sources = []
+    for path in paths:
+        source_code = read_file_source(path)
+        if source_code is None:
+            raise SystemExit(f"Cannot read starter code {path}")
+        sources.append(source_code)
+    return tuple(sources)
+
+def write_profile(args):
+    if counters.get("template_nodes"):
+        print(f"{counters['template_nodes']} nodes matching starter code subtracted", file=sys.stderr)
+    pruned = {name: counters.get(f"pruned_{name}", 0) for name in ("length", "multiset", "cutoff")}
+    if any(pruned.values()):
+        print(f"{sum(pruned.values())} comparisons pruned below --threshold "
+              f"({pruned['length']} by length, {pruned['multiset']} by node counts, {pruned['cutoff']} by cutoff)", file=sys.stderr)
+    if counters.get("short_circuited"):
+        print(f"{counters['short_circuited']} comparisons short-circuited by identical canonical hashes", file=sys.stderr)
+    if args.profile:
+        print(json.dumps(stage_report(), indent=2), file=sys.stderr)
+    if args.profile_output:
+        write_report(args.profile_output)
+    if args.trace:
+        write_chrome_trace(args.trace)
+    write_configured_reports()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sourceplag", description="Headless SourcePlag comparison jobs.")
+    parser.add_argument("--language", required=True, type=str.lower, choices=sorted(LANGUAGES))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--threshold", type=float, default=None, help="skip exact scoring of pairs below this similarity (0-1)")
+    parser.add_argument("--format", dest="output_format", choices=sorted(FILE_WRITERS), default=None,
+                        help="output format (default: from the --output extension, else jsonl)")
+    parser.add_argument("--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--max-rows", type=int, default=None, help="split output into files of at most this many rows")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the fingerprint cache")
+    parser.add_argument("--profile", action="store_true", help="print stage timings, histograms and the slowest files to stderr as JSON")
+    parser.add_argument("--profile-output", help="write the profile report to this JSON file")
+    parser.add_argument("--trace", help="write a Chrome trace (chrome://tracing, Perfetto) of every stage to this file")
+    parser.add_argument("--cpp-single-file", action="store_true", help="don't follow #include directives in C/C++ files")
+    parser.add_argument("--lexer", action="store_true", help="compare token streams instead of syntax trees: faster, and scores files that don't parse")
+    parser.add_argument("--template", dest="templates", action="append", default=[],
+                        help="starter code to subtract from every submission before comparing; repeat for several files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser("compare", help="compare submissions against one reference")
+    compare.add_argument("reference")
+    compare.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+
+    pairs = commands.add_parser("all-pairs", help="compare every submission with every other one")
+    pairs.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+    pairs.add_argument("--top-k", type=int, default=TOP_K)
+
+    corpus_build = commands.add_parser("corpus-build", help="fingerprint submissions into a corpus file, appending if it exists")
+    corpus_build.add_argument("corpus", help="corpus file (.npz)")
+    corpus_build.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+
+    corpus_query = commands.add_parser("corpus-query", help="rank a corpus file's submissions against one reference")
+    corpus_query.add_argument("corpus", help="corpus file (.npz)")
+    corpus_query.add_argument("reference")
+    corpus_query.add_argument("--top-k", type=int, default=20)
+
+    copied = commands.add_parser("copied-functions", help="find functions sharing large identical subtrees with another submission")
+    copied.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+    copied.add_argument("--min-nodes", type=int, default=25, help="smallest shared subtree reported, in syntax tree nodes")
+
+    matches = commands.add_parser("function-matches", help="match every function against every other submission's functions")
+    matches.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+    matches.add_argument("--top-k", type=int, default=1000)
+
+    index_add_command = commands.add_parser("index-add", help="add submissions to a MinHash/LSH index, replacing earlier ones of the same name")
+    index_add_command.add_argument("index", help="index file (SQLite)")
+    index_add_command.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+    index_add_command.add_argument("--rebuild", action="store_true", help="clear an index built with different settings instead of refusing it")
+
+    index_query = commands.add_parser("index-query", help="look up near-duplicates of a reference in an index")
+    index_query.add_argument("index", help="index file (SQLite)")
+    index_query.add_argument("reference")
+    index_query.add_argument("--top-k", type=int, default=20)
+
+    index_recall_command = commands.add_parser("index-recall", help="measure index recall against a brute-force scan, using each path as a query")
+    index_recall_command.add_argument("index", help="index file (SQLite)")
+    index_recall_command.add_argument("paths", nargs="+", help="files, directories or zip/tar archives")
+    index_recall_command.add_argument("--top-k", type=int, default=20)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    language = LANGUAGES[args.language]
+    if args.no_cache:
+        plag_cache.CACHE_ENABLED = False
+    plag_engine.CPP_SINGLE_FILE_PARSE = args.cpp_single_file
+    plag_engine.LEXER_MODE = args.lexer
+    plag_engine.TEMPLATE_SOURCES = read_templates(args.templates)
+    if args.profile or args.profile_output or args.trace:
+        enable_profiling(trace=bool(args.trace))
+
+    if args.command == "corpus-build":
+        build_corpus_file(args.paths, args.corpus, language, args.workers)
+        write_profile(args)
+        return 0
+
+    if args.command == "index-add":
+        index_add(args.paths, args.index, language, args.workers, args.rebuild)
+        return 0
+    if args.command == "index-recall":
+        index_recall(args.paths, args.index, language, args.top_k, args.threshold, args.workers)
+        return 0
+
+    if args.command == "compare":
+        rows = compare_rows(args.reference, args.paths, language, args.workers, args.threshold)
+        columns = COMPARE_COLUMNS
+    elif args.command == "corpus-query":
+        rows = corpus_query_rows(args.reference, args.corpus, language, args.top_k)
+        columns = CORPUS_COLUMNS
+    elif args.command == "copied-functions":
+        rows = copied_function_rows(args.paths, language, args.min_nodes, args.workers)
+        columns = COPIED_FUNCTION_COLUMNS
+    elif args.command == "function-matches":
+        rows = function_match_rows(args.paths, language, args.top_k, args.threshold, args.workers)
+        columns = FUNCTION_MATCH_COLUMNS
+    elif args.command == "index-query":
+        rows = index_query_rows(args.reference, args.index, language, args.top_k, args.threshold)
+        columns = CORPUS_COLUMNS
+    else:
+        rows = all_pairs_rows(args.paths, language, args.top_k, args.workers, args.threshold)
+        columns = ALL_PAIRS_COLUMNS
+
+    if args.output == "-":
+        output_format = args.output_format or "jsonl"
+        if output_format not in WRITERS:
+            raise SystemExit(f"{output_format} output needs --output")
+        try:
+            write_rows(rows, columns, sys.stdout, output_format)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader stopped early (`| head`). Point stdout at devnull
+            # so the flush at exit doesn't raise again.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+    else:
+        try:
+            export_rows(rows, columns, args.output, args.output_format or format_for_path(args.output) or "jsonl", args.max_rows)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+
+    write_profile(args)
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
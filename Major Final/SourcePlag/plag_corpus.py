@@ -0,0 +1,101 @@
+import json
+import numpy as np
+from plag_batch import fingerprint_files
+from plag_engine import parser_version, template_digest
+
+# N-gram hashes are folded into 2**FEATURE_BITS columns. Collisions only
+# add a little noise to the cosine score.
+FEATURE_BITS = 20
+FEATURE_MASK = (1 << FEATURE_BITS) - 1
+TOP_K = 20
+
+
+def ngram_features(fingerprint):
+    hashes = np.frombuffer(fingerprint["ngrams"], dtype=np.uint64)
+    features, counts = np.unique((hashes & FEATURE_MASK).astype(np.int32), return_counts=True)
+    return features, counts.astype(np.float32)
+
+def empty_corpus(language):
+    return {
+        "language": language,
+        "parser": parser_version(language),
+        "templates": template_digest(),
+        "names": [],
+        "indptr": np.zeros(1, dtype=np.int64),
+        "indices": np.zeros(0, dtype=np.int32),
+        "data": np.zeros(0, dtype=np.float32),
+        "norms": np.zeros(0, dtype=np.float64),
+    }
+
+def extend_corpus(corpus, named_fingerprints):
+    # Rows are appended as one CSR block per call, so adding a new year of
+    # submissions does not rebuild the existing matrix row by row.
+    names, indices, data, lengths, norms = [], [], [], [], []
+    for name, fingerprint in named_fingerprints:
+        if fingerprint is None:
+            continue
+        features, counts = ngram_features(fingerprint)
+        names.append(name)
+        indices.append(features)
+        data.append(counts)
+        lengths.append(len(features))
+        weights = counts.astype(np.float64)
+        norms.append(np.sqrt(np.dot(weights, weights)))
+    if not names:
+        return corpus
+    corpus["names"].extend(names)
+    corpus["indptr"] = np.concatenate([corpus["indptr"], corpus["indptr"][-1] + np.cumsum(lengths)])
+    corpus["indices"] = np.concatenate([corpus["indices"]] + indices)
+    corpus["data"] = np.concatenate([corpus["data"]] + data)
+    corpus["norms"] = np.concatenate([corpus["norms"], np.array(norms, dtype=np.float64)])
+    return corpus
+
+def build_corpus(paths, language, workers=None):
+    return extend_corpus(empty_corpus(language), fingerprint_files(paths, language, workers))
+
+def save_corpus(corpus, path):
+    with open(path, 'wb') as file:
+        np.savez(file, indptr=corpus["indptr"], indices=corpus["indices"], data=corpus["data"],
+                 norms=corpus["norms"], meta=np.array(json.dumps({"language": corpus["language"], "parser": corpus["parser"], "templates": corpus["templates"],
+                                                  "names": corpus["names"]})))
+
+def load_corpus(path):
+    with np.load(path) as stored:
+        meta = json.loads(str(stored["meta"]))
+        return {
+            "language": meta["language"],
+            "parser": meta.get("parser"),
+            "templates": meta.get("templates", ""),
+            "names": meta["names"],
+            "indptr": stored["indptr"],
+            "indices": stored["indices"],
+            "data": stored["data"],
+            "norms": stored["norms"],
+        }
+
+def score_corpus(corpus, fingerprint, top_k=TOP_K):
+    # Cosine similarity of n-gram count vectors against every stored row in
+    # one pass over the CSR arrays: gather the query weight for each stored
+    # feature, multiply, and sum each row's segment.
+    rows = len(corpus["names"])
+    if fingerprint is None or rows == 0:
+        return []
+    features, counts = ngram_features(fingerprint)
+    # Sums run in float64, and scores are clipped: a float32 sum let an
+    # identical file come out just above 1.
+    query = np.zeros(FEATURE_MASK + 1, dtype=np.float64)
+    query[features] = counts
+    products = corpus["data"] * query[corpus["indices"]]
+    starts = corpus["indptr"][:-1]
+    nonempty = np.diff(corpus["indptr"]) > 0
+    dots = np.zeros(rows, dtype=np.float64)
+    if products.size:
+        dots[nonempty] = np.add.reduceat(products, starts[nonempty])
+    weights = query[features]
+    norms = corpus["norms"] * np.sqrt(np.dot(weights, weights))
+    scores = np.divide(dots, norms, out=np.zeros(rows, dtype=np.float64), where=norms > 0)
+    np.clip(scores, 0.0, 1.0, out=scores)
+    top_k = min(top_k, rows)
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    best = best[np.argsort(-scores[best])]
+    return [(corpus["names"][i], float(scores[i])) for i in best]
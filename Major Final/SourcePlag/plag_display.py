@@ -0,0 +1,61 @@
+import ast
+from collections import OrderedDict
+from plag_engine import generate_ast, preprocess_code, iter_hierarchical_representation, iter_hierarchical_representation_cpp
+from plag_cache import content_digest
+
+# Characters of AST text rendered at a time; the rest waits behind
+# "Show more". Dumps are only built when a pane asks for them.
+AST_DISPLAY_LIMIT = 100_000
+DUMP_CACHE_SIZE = 16
+
+dump_cache = OrderedDict()
+
+
+def iter_ast_dump(tree, language):
+    if language == "Python":
+        yield ast.dump(tree, indent=2)
+    elif language == "C/C++":
+        yield from iter_hierarchical_representation_cpp(tree)
+    else:
+        yield from iter_hierarchical_representation(tree)
+
+def get_dump(code, language):
+    key = (content_digest(code), language)
+    entry = dump_cache.get(key)
+    if entry is not None:
+        dump_cache.move_to_end(key)
+        return entry
+    tree = generate_ast(preprocess_code(code), language)
+    if tree is None:
+        return None
+    entry = {"pages": [], "pieces": iter_ast_dump(tree, language), "buffer": [], "buffered": 0, "done": False}
+    dump_cache[key] = entry
+    if len(dump_cache) > DUMP_CACHE_SIZE:
+        dump_cache.popitem(last=False)
+    return entry
+
+def fill_page(entry, limit):
+    buffer = entry["buffer"]
+    while entry["buffered"] < limit:
+        piece = next(entry["pieces"], None)
+        if piece is None:
+            entry["done"] = True
+            break
+        buffer.append(piece)
+        entry["buffered"] += len(piece)
+    text = "".join(buffer)
+    page, rest = text[:limit], text[limit:]
+    entry["buffer"] = [rest] if rest else []
+    entry["buffered"] = len(rest)
+    if page:
+        entry["pages"].append(page)
+
+def dump_page(entry, page, limit=None):
+    if limit is None:
+        limit = AST_DISPLAY_LIMIT
+    while len(entry["pages"]) <= page and not (entry["done"] and not entry["buffered"]):
+        fill_page(entry, limit)
+    if page >= len(entry["pages"]):
+        return "", False
+    more = page + 1 < len(entry["pages"]) or not entry["done"] or entry["buffered"] > 0
+    return entry["pages"][page], more
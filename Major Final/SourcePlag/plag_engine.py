@@ -0,0 +1,503 @@
+import ast
+import hashlib
+import io
+import keyword
+import os
+import sys
+import tokenize
+from array import array
+from collections import Counter
+import platform
+from importlib import metadata
+import Levenshtein
+from plag_fingerprint import kind_id, winnow_kinds, ngram_profile, multiset_jaccard, structure_hash, subtree_end, subtree_hash
+from plag_fingerprint import kgram_hashes, template_coverage, remove_nodes
+from plag_profile import stage, count
+
+# Bump whenever token_stream or fingerprint_tree change their output,
+# so stale entries in the fingerprint cache are discarded.
+NORMALIZER_VERSION = 7
+
+# Arguments for every C/C++ parse. Single-file parsing skips all #include
+# directives, which is much faster on header-heavy submissions, but
+# unresolved library types change the shape of the tree, so it is opt-in.
+CPP_PARSE_ARGS = ['-std=c++11']
+CPP_SINGLE_FILE_PARSE = False
+# CXTranslationUnit_SingleFileParse, not exposed by clang.cindex.
+SINGLE_FILE_PARSE_FLAG = 0x400
+
+# Lexer mode fingerprints token classes instead of syntax trees: keywords
+# and punctuation keep their text, identifiers and literals collapse to
+# one class each. Much cheaper than parsing, and files with syntax errors
+# still get a score.
+LEXER_MODE = False
+PYTHON_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+# Node kinds hashed on their own as functions. Nested functions are part
+# of the enclosing one's hash.
+FUNCTION_KINDS = {
+    "Python": ("FunctionDef", "AsyncFunctionDef"),
+    "Java": ("MethodDeclaration", "ConstructorDeclaration"),
+    "C/C++": ("FUNCTION_DECL", "CXX_METHOD", "CONSTRUCTOR", "DESTRUCTOR", "FUNCTION_TEMPLATE"),
+}
+
+# Starter code handed out with the assignment. Every k-gram it contains is
+# cut out of each submission before comparison, so scores only reflect
+# what students wrote and template code never pairs submissions up.
+TEMPLATE_SOURCES = ()
+
+clang_index = None
+cpp_parse_count = 0
+# Template k-gram sets per language and parser settings, built on first use.
+template_kgram_sets = {}
+
+# Scores below this are not worth computing exactly; None scores every pair.
+SIMILARITY_THRESHOLD = None
+
+# javalang and clang are imported on first use, so headless jobs only pay
+# for the front end of the language they compare.
+
+def engine_settings():
+    return CPP_SINGLE_FILE_PARSE, LEXER_MODE, TEMPLATE_SOURCES
+
+def apply_engine_settings(settings):
+    global CPP_SINGLE_FILE_PARSE, LEXER_MODE, TEMPLATE_SOURCES
+    CPP_SINGLE_FILE_PARSE, LEXER_MODE, TEMPLATE_SOURCES = settings
+
+def template_digest():
+    # Identifies the registered templates, for keys of stored results.
+    if not TEMPLATE_SOURCES:
+        return ""
+    digest = hashlib.blake2b(digest_size=16)
+    for code in TEMPLATE_SOURCES:
+        digest.update(preprocess_code(code).encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def parser_version(language):
+    # Part of every cache key, so it names each switch that changes the
+    # fingerprint. The lexer always skips includes.
+    if LEXER_MODE:
+        return "lexer-" + base_parser_version(language)
+    if language == "C/C++" and CPP_SINGLE_FILE_PARSE:
+        return base_parser_version(language) + "-single-file"
+    return base_parser_version(language)
+
+def base_parser_version(language):
+    if language == "Python":
+        return "python-" + ".".join(platform.python_version_tuple()[:2])
+    package = {"Java": "javalang", "C/C++": "libclang"}[language]
+    try:
+        return f"{package}-{metadata.version(package)}"
+    except metadata.PackageNotFoundError:
+        return f"{package}-unknown"
+
+def preprocess_code(code):
+    return code.strip()
+
+def generate_ast(code, language):
+    with stage("parse"):
+        return parse_code(code, language)
+
+def parse_code(code, language):
+    try:
+        if language == "Python":
+            tree = ast.parse(code)
+        elif language == "Java":
+            tree = parse_java(code)
+        elif language == "C/C++":
+            tree = parse_cpp(code)
+        return tree
+    except (SyntaxError, RecursionError) as e:
+        print(f"Invalid code: {e}", file=sys.stderr)
+        return None
+
+def parse_java(code):
+    import javalang
+    try:
+        return javalang.parse.parse(code)
+    except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError) as e:
+        raise SyntaxError(getattr(e, "description", None) or str(e)) from e
+
+def get_clang_index():
+    global clang_index
+    if clang_index is None:
+        import clang.cindex
+        clang_index = clang.cindex.Index.create()
+    return clang_index
+
+def is_java_node(node):
+    javalang = sys.modules.get("javalang")
+    return javalang is not None and isinstance(node, javalang.ast.Node)
+
+def parse_cpp(code):
+    # One index per process; each parse gets its own in-memory file name so
+    # translation units that are still alive never alias each other.
+    global cpp_parse_count
+    cpp_parse_count += 1
+    file_name = f"submission_{os.getpid()}_{cpp_parse_count}.cpp"
+    index = get_clang_index()
+    import clang.cindex
+    options = clang.cindex.TranslationUnit.PARSE_NONE
+    if CPP_SINGLE_FILE_PARSE:
+        options |= SINGLE_FILE_PARSE_FLAG
+    try:
+        tu = index.parse(file_name, args=CPP_PARSE_ARGS, unsaved_files=[(file_name, code)], options=options)
+    except clang.cindex.TranslationUnitLoadError as e:
+        raise SyntaxError(str(e)) from e
+    return tu.cursor
+
+def lex_code(code, language):
+    if language == "Python":
+        return lex_python(code)
+    if language == "Java":
+        return lex_java(code)
+    return lex_cpp(code)
+
+def lex_python(code):
+    classes = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in PYTHON_SKIPPED_TOKENS:
+                continue
+            if token.type == tokenize.NAME:
+                classes.append(token.string if keyword.iskeyword(token.string) else "NAME")
+            elif token.type == tokenize.OP:
+                classes.append(token.string)
+            else:
+                classes.append(tokenize.tok_name[token.type])
+    except (tokenize.TokenError, SyntaxError) as e:
+        # Keep the tokens read so far; a broken tail still leaves most of
+        # the file to compare.
+        print(f"Tokenizing stopped early: {e}", file=sys.stderr)
+    return classes
+
+def lex_java(code):
+    import javalang
+    tokenizer = javalang.tokenizer
+    classes = []
+    for token in tokenizer.tokenize(code, ignore_errors=True):
+        if isinstance(token, tokenizer.Identifier):
+            classes.append("Identifier")
+        elif isinstance(token, tokenizer.Literal):
+            classes.append("Literal")
+        else:
+            classes.append(token.value)
+    return classes
+
+def lex_cpp(code):
+    # libclang lexes the buffer for us; skipping function bodies and
+    # includes keeps the accompanying parse to a minimum.
+    global cpp_parse_count
+    cpp_parse_count += 1
+    file_name = f"submission_{os.getpid()}_{cpp_parse_count}.cpp"
+    import clang.cindex
+    cindex = clang.cindex
+    options = cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES | SINGLE_FILE_PARSE_FLAG
+    try:
+        tu = get_clang_index().parse(file_name, args=CPP_PARSE_ARGS, unsaved_files=[(file_name, code)], options=options)
+    except cindex.TranslationUnitLoadError as e:
+        print(f"Invalid code: {e}", file=sys.stderr)
+        return []
+    extent = tu.get_extent(file_name, (0, len(code.encode('utf-8'))))
+    # Straight to libclang: Token.kind and Token.spelling wrap every call
+    # in Python objects, which costs more than the lexing itself.
+    token_kind = cindex.conf.lib.clang_getTokenKind
+    token_spelling = cindex.conf.lib.clang_getTokenSpelling
+    identifier = cindex.TokenKind.IDENTIFIER.value
+    literal = cindex.TokenKind.LITERAL.value
+    comment = cindex.TokenKind.COMMENT.value
+    classes = []
+    for token in tu.get_tokens(extent=extent):
+        kind = token_kind(token)
+        if kind == identifier:
+            classes.append("IDENTIFIER")
+        elif kind == literal:
+            classes.append("LITERAL")
+        elif kind != comment:
+            classes.append(token_spelling(tu, token))
+    return classes
+
+def compare_asts(ast1, ast2):
+    return compare_fingerprints(fingerprint_tree(ast1, "Python"), fingerprint_tree(ast2, "Python"))
+
+def compare_java_asts(ast1, ast2):
+    return compare_fingerprints(fingerprint_tree(ast1, "Java"), fingerprint_tree(ast2, "Java"))
+
+def compare_cpp_asts(ast1, ast2):
+    return compare_fingerprints(fingerprint_tree(ast1, "C/C++"), fingerprint_tree(ast2, "C/C++"))
+
+def iter_hierarchical_representation(node, depth=0):
+    # Explicit stack of pending output: plain strings are written as-is,
+    # (node, depth) pairs are expanded in place. Keeps deep trees clear of
+    # the recursion limit and each piece of text is produced only once.
+    stack = [(node, depth)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+        node, depth = item
+        indent = '    ' * depth
+        parts = []
+        if is_java_node(node):
+            yield f"{indent}{node.__class__.__name__} {{"
+            for attr_name, attr_value in vars(node).items():
+                if isinstance(attr_value, list) or is_java_node(attr_value):
+                    parts.append(f"\n{indent}    {attr_name}:")
+                    append_children(parts, attr_value, indent, depth)
+                else:
+                    parts.append(f"\n{indent}    {attr_name}: {attr_value}")
+            parts.append(f"\n{indent}}}")
+        elif isinstance(node, ast.AST):
+            yield f"{indent}{node.__class__.__name__.upper()} {{"
+            for attr_name, attr_value in ast.iter_fields(node):
+                parts.append(f"\n{indent}    {attr_name}:")
+                append_children(parts, attr_value, indent, depth)
+            parts.append(f"\n{indent}}}")
+        else:
+            yield f"{indent}{node.__class__.__name__}"
+        stack.extend(reversed(parts))
+
+def append_children(parts, attr_value, indent, depth):
+    if isinstance(attr_value, list):
+        for i, child in enumerate(attr_value):
+            parts.append(f"\n{indent}        [{i}] ")
+            parts.append((child, depth + 2))
+    else:
+        parts.append(f"\n{indent}        ")
+        parts.append((attr_value, depth + 2))
+
+def iter_hierarchical_representation_cpp(cursor, depth=0):
+    stack = [(cursor, depth)]
+    first = True
+    while stack:
+        cursor, depth = stack.pop()
+        if not first:
+            yield "\n"
+        first = False
+        yield '    ' * depth + cursor.kind.name
+        if cursor.kind.is_declaration():
+            yield f" ({cursor.displayname})"
+        stack.extend((child, depth + 1) for child in reversed(list(cursor.get_children())))
+
+def token_stream(tree, language, functions=None):
+    # The shared compact form every comparator works on: node kinds in
+    # pre-order as interned IDs, plus each node's parent position (-1 for
+    # the root). Two flat arrays pickle and cache as plain bytes. If a
+    # functions list is given, (position, name, line) of every function
+    # node is appended to it.
+    kinds = array('I')
+    parents = array('i')
+    function_kinds = FUNCTION_KINDS[language] if functions is not None else ()
+    if language == "Python":
+        stack = [(tree, -1)]
+        children = ast.iter_child_nodes
+    elif language == "Java":
+        stack = [(tree, -1)]
+        children = java_children
+    elif language == "C/C++":
+        main_file = tree.translation_unit.spelling
+        stack = [(child, -1) for child in reversed(list(tree.get_children()))
+                 if child.location.file is not None and child.location.file.name == main_file]
+        children = clang_children
+    while stack:
+        node, parent = stack.pop()
+        position = len(kinds)
+        kind = node_kind(node, language)
+        if kind in function_kinds and (language != "C/C++" or node.is_definition()):
+            functions.append((position, function_name(node, language), function_line(node, language)))
+        kinds.append(kind_id(kind))
+        parents.append(parent)
+        stack.extend((child, position) for child in reversed(list(children(node))))
+    return kinds, parents
+
+def node_kind(node, language):
+    if language == "C/C++":
+        return node.kind.name
+    return type(node).__name__
+
+def function_name(node, language):
+    if language == "C/C++":
+        return node.spelling
+    return node.name
+
+def function_line(node, language):
+    if language == "C/C++":
+        return node.location.line
+    if language == "Java":
+        return node.position.line if node.position else None
+    return node.lineno
+
+def java_children(node):
+    # Same order as javalang's own walk_tree, which descends into nested
+    # lists and tuples of children.
+    stack = [iter(node.children)]
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, (list, tuple)):
+                stack.append(iter(child))
+                break
+            if is_java_node(child):
+                yield child
+        else:
+            stack.pop()
+
+def clang_children(cursor):
+    return cursor.get_children()
+
+def fingerprint_tree(tree, language):
+    with stage("serialize"):
+        functions = []
+        kinds, parents = token_stream(tree, language, functions)
+    return fingerprint_kinds(kinds, parents, language, functions)
+
+def fingerprint_tokens(code, language):
+    with stage("lex"):
+        classes = lex_code(code, language)
+    if not classes:
+        return None
+    kinds = array('I', (kind_id(token_class) for token_class in classes))
+    # Tokens have no tree shape; every one hangs off a virtual root.
+    return fingerprint_kinds(kinds, array('i', [-1]) * len(kinds), language)
+
+def fingerprint_kinds(kinds, parents, language, functions=()):
+    fingerprint = {"language": language, "nodes": len(kinds), "kinds": kinds, "parents": parents}
+    with stage("ngrams"):
+        fingerprint["ngrams"] = ngram_profile(kinds)
+    with stage("winnow"):
+        fingerprint["winnow"] = winnow_kinds(kinds)
+    with stage("hash"):
+        fingerprint["hash"] = structure_hash(kinds, parents)
+        fingerprint["functions"] = top_level_functions(kinds, parents, functions)
+    return fingerprint
+
+def top_level_functions(kinds, parents, functions):
+    # Functions nested in another one are part of the enclosing unit.
+    units = []
+    end = 0
+    for start, name, line in functions:
+        if start < end:
+            continue
+        end = subtree_end(parents, start)
+        units.append({"name": name, "line": line, "start": start, "end": end, "hash": subtree_hash(kinds, parents, start, end)})
+    return units
+
+def prepare_reference(code, language):
+    return subtract_templates(fingerprint_code(code, language), language)
+
+def fingerprint_code(code, language):
+    with stage("preprocess"):
+        code = preprocess_code(code)
+    if LEXER_MODE:
+        return fingerprint_tokens(code, language)
+    tree = generate_ast(code, language)
+    if tree is None:
+        return None
+    return fingerprint_tree(tree, language)
+
+def template_kgrams(language):
+    key = (language, parser_version(language), TEMPLATE_SOURCES)
+    kgrams = template_kgram_sets.get(key)
+    if kgrams is None:
+        kgrams = set()
+        for code in TEMPLATE_SOURCES:
+            template = fingerprint_code(code, language)
+            if template is None:
+                print("Starter code could not be parsed; it is not subtracted", file=sys.stderr)
+                continue
+            kgrams.update(kgram_hashes(template["kinds"]))
+        kgrams = template_kgram_sets[key] = frozenset(kgrams)
+    return kgrams
+
+def subtract_templates(fingerprint, language):
+    # Returns the fingerprint of what is left once template code is cut out.
+    # The cache keeps full fingerprints, so registering a template never
+    # invalidates it.
+    if fingerprint is None or not TEMPLATE_SOURCES:
+        return fingerprint
+    with stage("template"):
+        kgrams = template_kgrams(language)
+        covered = template_coverage(fingerprint["kinds"], kgrams)
+        if not any(covered):
+            return fingerprint
+        # A function keeps its own node while any of its body survives, so
+        # filled-in stubs still count as functions.
+        for function in fingerprint["functions"]:
+            if 0 in covered[function["start"]:function["end"]]:
+                covered[function["start"]] = 0
+        kinds, parents, positions = remove_nodes(fingerprint["kinds"], fingerprint["parents"], covered)
+        functions = [(positions[function["start"]], function["name"], function["line"])
+                     for function in fingerprint["functions"] if not covered[function["start"]]]
+    count("template_nodes", fingerprint["nodes"] - len(kinds))
+    remainder = fingerprint_kinds(kinds, parents, language, functions)
+    # Joining the pieces around a cut can recreate a template k-gram.
+    remainder["winnow"] = array('Q', (value for value in remainder["winnow"] if value not in kgrams))
+    return remainder
+
+def compare_fingerprints(fp1, fp2, threshold=None):
+    if threshold is None:
+        threshold = SIMILARITY_THRESHOLD
+    if not fp1["nodes"] or not fp2["nodes"]:
+        # Nothing to compare, as when a submission is all template code.
+        return 0.0
+    if fp1["hash"] == fp2["hash"]:
+        # Same canonical structure: every comparator would return 1.0.
+        count("short_circuited")
+        return 1.0
+    with stage("compare"):
+        if fp1["language"] == "Python":
+            return compare_kind_sequences(fp1["kinds"], fp2["kinds"], threshold)
+        if threshold and length_bound(len(fp1["ngrams"]), len(fp2["ngrams"]), jaccard=True) < threshold:
+            count("pruned_length")
+            return 0.0
+        count("scored")
+        return multiset_jaccard(fp1["ngrams"], fp2["ngrams"])
+
+def length_bound(length1, length2, jaccard=False):
+    if jaccard:
+        return min(length1, length2) / max(length1, length2) if max(length1, length2) else 1.0
+    total = length1 + length2
+    return 2 * min(length1, length2) / total if total else 1.0
+
+def multiset_bound(kinds1, kinds2):
+    # Every node kind the two multisets don't share costs at least one
+    # insertion or deletion, which caps the achievable ratio.
+    counts2 = Counter(kinds2)
+    shared = sum(min(number, counts2[kind]) for kind, number in Counter(kinds1).items())
+    total = len(kinds1) + len(kinds2)
+    return 2 * shared / total if total else 1.0
+
+def compare_kind_sequences(kinds1, kinds2, threshold):
+    # Pairs that cannot reach the threshold score 0.0, the same convention
+    # Levenshtein.ratio uses for score_cutoff.
+    if not threshold:
+        count("scored")
+        return Levenshtein.ratio(kinds1, kinds2)
+    if length_bound(len(kinds1), len(kinds2)) < threshold:
+        count("pruned_length")
+        return 0.0
+    if multiset_bound(kinds1, kinds2) < threshold:
+        count("pruned_multiset")
+        return 0.0
+    similarity = Levenshtein.ratio(kinds1, kinds2, score_cutoff=threshold)
+    count("pruned_cutoff" if similarity < threshold else "scored")
+    return similarity
+
+def compare_to_reference(reference, candidate, threshold=None):
+    # Pruned pairs score 0.0, which would read as a genuine 0%, so anything
+    # under the threshold is reported as such instead of as a number.
+    if reference is None or candidate is None:
+        return "Invalid code"
+    if threshold is None:
+        threshold = SIMILARITY_THRESHOLD
+    similarity = compare_fingerprints(reference, candidate, threshold)
+    if threshold and similarity < threshold:
+        return "Below threshold"
+    return similarity
+
+def calculate_similarity_prepared(reference, code, language):
+    return compare_to_reference(reference, prepare_reference(code, language))
+
+def calculate_similarity(code1, code2, language):
+    return calculate_similarity_prepared(prepare_reference(code1, language), code2, language)
@@ -0,0 +1,127 @@
+import csv
+import json
+import os
+from itertools import chain, islice
+
+COMPARE_COLUMNS = ["file", "similarity", "error"]
+ALL_PAIRS_COLUMNS = ["file1", "file2", "similarity", "shared_fingerprints", "nodes1", "nodes2", "error"]
+COPIED_FUNCTION_COLUMNS = ["file1", "function1", "line1", "file2", "function2", "line2", "shared_nodes", "coverage"]
+FUNCTION_MATCH_COLUMNS = ["file1", "function1", "line1", "file2", "function2", "line2", "similarity", "shared_fingerprints"]
+COLUMN_TYPES = {"similarity": "float", "shared_fingerprints": "int", "nodes1": "int", "nodes2": "int",
+                "line1": "int", "line2": "int", "shared_nodes": "int", "coverage": "float"}
+# Excel stops at 1,048,576 rows a sheet; one of them is the header.
+XLSX_MAX_ROWS = 1_048_575
+PARQUET_BATCH_ROWS = 65_536
+FORMAT_EXTENSIONS = {
+    ".jsonl": "jsonl",
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".parquet": "parquet",
+}
+
+
+def result_row(name, similarity):
+    if isinstance(similarity, str):
+        return {"file": name, "similarity": None, "error": similarity}
+    return {"file": name, "similarity": similarity, "error": None}
+
+def pair_row(file1, file2, similarity, shared=None, nodes1=None, nodes2=None, error=None):
+    return {"file1": file1, "file2": file2, "similarity": similarity, "shared_fingerprints": shared,
+            "nodes1": nodes1, "nodes2": nodes2, "error": error}
+
+def write_jsonl(rows, columns, stream):
+    for row in rows:
+        stream.write(json.dumps({column: row.get(column) for column in columns}) + "\n")
+
+def write_csv(rows, columns, stream):
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+
+WRITERS = {
+    "jsonl": write_jsonl,
+    "csv": write_csv,
+}
+
+def write_rows(rows, columns, stream, output_format="jsonl"):
+    WRITERS[output_format](rows, columns, stream)
+
+def write_text_file(rows, columns, path, output_format):
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        write_rows(rows, columns, stream, output_format)
+
+def write_xlsx(rows, columns, path):
+    # Write-only workbooks stream rows to disk instead of keeping every
+    # cell object in memory.
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = None
+    written = 0
+    for row in rows:
+        if sheet is None or written >= XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet(f"Results {len(workbook.worksheets) + 1}" if sheet else "Results")
+            sheet.append(columns)
+            written = 0
+        sheet.append([row.get(column) for column in columns])
+        written += 1
+    if sheet is None:
+        workbook.create_sheet("Results").append(columns)
+    workbook.save(path)
+
+def parquet_schema(columns):
+    import pyarrow as pa
+    types = {"float": pa.float64(), "int": pa.int64()}
+    return pa.schema([(column, types.get(COLUMN_TYPES.get(column), pa.string())) for column in columns])
+
+def write_parquet(rows, columns, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package")
+    schema = parquet_schema(columns)
+    with pq.ParquetWriter(path, schema) as writer:
+        rows = iter(rows)
+        while True:
+            batch = [{column: row.get(column) for column in columns} for row in islice(rows, PARQUET_BATCH_ROWS)]
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+FILE_WRITERS = {
+    "jsonl": lambda rows, columns, path: write_text_file(rows, columns, path, "jsonl"),
+    "csv": lambda rows, columns, path: write_text_file(rows, columns, path, "csv"),
+    "xlsx": write_xlsx,
+    "parquet": write_parquet,
+}
+
+def format_for_path(path):
+    return FORMAT_EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+
+def part_path(path, part):
+    if part == 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{part}{extension}"
+
+def export_rows(rows, columns, path, output_format=None, max_rows=None):
+    # With max_rows set, output goes to path, then path-2, path-3, ... each
+    # holding at most max_rows rows. Returns the paths written.
+    if output_format is None:
+        output_format = format_for_path(path)
+    if output_format not in FILE_WRITERS:
+        raise ValueError(f"Unknown export format for {path}")
+    rows = iter(rows)
+    written = []
+    while True:
+        chunk = islice(rows, max_rows) if max_rows else rows
+        first = next(chunk, None)
+        if first is None and written:
+            break
+        part = part_path(str(path), len(written) + 1)
+        FILE_WRITERS[output_format](chain([first], chunk) if first is not None else iter(()), columns, part)
+        written.append(part)
+        if first is None or not max_rows:
+            break
+    return written
@@ -0,0 +1,140 @@
+import hashlib
+import zlib
+from array import array
+from collections import Counter, deque
+
+# Length of the node-kind k-grams that get hashed, and the winnowing
+# window. Any run of WINNOW_K + WINNOW_WINDOW - 1 matching nodes is
+# guaranteed to share at least one fingerprint.
+WINNOW_K = 12
+WINNOW_WINDOW = 8
+# Length of the node-kind n-grams compared by the structural similarity
+# used for Java and C/C++.
+NGRAM_SIZE = 4
+
+HASH_BASE = 1000003
+HASH_MOD = (1 << 61) - 1
+
+kind_ids = {}
+
+
+def kind_id(kind):
+    # Node kinds are interned as their crc32 rather than a running counter
+    # or hash(), so the IDs agree across processes, runs and the cache.
+    value = kind_ids.get(kind)
+    if value is None:
+        value = kind_ids[kind] = zlib.crc32(kind.encode('utf-8'))
+    return value
+
+def structure_hash(kinds, parents):
+    # Node kinds and tree shape only, so renaming identifiers or changing
+    # literals leaves the hash unchanged.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(kinds.tobytes())
+    digest.update(parents.tobytes())
+    return digest.hexdigest()
+
+def subtree_end(parents, start):
+    # In pre-order, a subtree runs until the first node whose parent lies
+    # before its root.
+    end = start + 1
+    while end < len(parents) and parents[end] >= start:
+        end += 1
+    return end
+
+def subtree_hash(kinds, parents, start, end):
+    relative = array('i', (parent - start for parent in parents[start + 1:end]))
+    return structure_hash(kinds[start:end], relative)
+
+def merkle_hashes(kinds, parents):
+    # Bottom-up hash of every subtree in one reverse pass over the pre-order
+    # stream: children always come after their parent, so each is finished
+    # before it is folded into the parent. Returns (hashes, sizes).
+    count = len(kinds)
+    folded = [0] * count
+    sizes = [1] * count
+    hashes = [0] * count
+    for position in range(count - 1, -1, -1):
+        value = ((folded[position] * HASH_BASE + kinds[position]) * HASH_BASE + sizes[position]) % HASH_MOD
+        hashes[position] = value
+        parent = parents[position]
+        if parent >= 0:
+            folded[parent] = (folded[parent] * HASH_BASE + value) % HASH_MOD
+            sizes[parent] += sizes[position]
+    return hashes, sizes
+
+def kgram_hashes(tokens, k=WINNOW_K):
+    if len(tokens) < k:
+        return [hash_tokens(tokens)] if tokens else []
+    top = pow(HASH_BASE, k - 1, HASH_MOD)
+    value = hash_tokens(tokens[:k])
+    hashes = [value]
+    for i in range(k, len(tokens)):
+        value = ((value - tokens[i - k] * top) * HASH_BASE + tokens[i]) % HASH_MOD
+        hashes.append(value)
+    return hashes
+
+def hash_tokens(tokens):
+    value = 0
+    for token in tokens:
+        value = (value * HASH_BASE + token) % HASH_MOD
+    return value
+
+def winnow(hashes, window=WINNOW_WINDOW):
+    if len(hashes) <= window:
+        return array('Q', [min(hashes)] if hashes else [])
+    selected = set()
+    candidates = deque()
+    for i, value in enumerate(hashes):
+        # Keep candidate minima in increasing order; ties go to the rightmost.
+        while candidates and hashes[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        if i >= window - 1:
+            selected.add(hashes[candidates[0]])
+    return array('Q', sorted(selected))
+
+def winnow_kinds(kinds, k=WINNOW_K, window=WINNOW_WINDOW):
+    return winnow(kgram_hashes(kinds, k), window)
+
+def template_coverage(kinds, kgrams, k=WINNOW_K):
+    # Marks every node inside a k-gram that also occurs in the template.
+    covered = bytearray(len(kinds))
+    if len(kinds) < k:
+        return covered
+    for start, value in enumerate(kgram_hashes(kinds, k)):
+        if value in kgrams:
+            covered[start:start + k] = b'\x01' * k
+    return covered
+
+def remove_nodes(kinds, parents, removed):
+    # Drops the marked nodes. A surviving node whose parent went is hung off
+    # its nearest surviving ancestor, so the result is still a pre-order
+    # tree. Also returns each old position's new one; for a removed node,
+    # that of its nearest surviving ancestor, or -1.
+    positions = array('i', [-1]) * len(kinds)
+    new_kinds = array('I')
+    new_parents = array('i')
+    for position, kind in enumerate(kinds):
+        parent = parents[position]
+        ancestor = positions[parent] if parent >= 0 else -1
+        if removed[position]:
+            positions[position] = ancestor
+            continue
+        positions[position] = len(new_kinds)
+        new_kinds.append(kind)
+        new_parents.append(ancestor)
+    return new_kinds, new_parents, positions
+
+def ngram_profile(kinds, n=NGRAM_SIZE):
+    return array('Q', sorted(kgram_hashes(kinds, n)))
+
+def multiset_jaccard(hashes1, hashes2):
+    counts1 = Counter(hashes1)
+    counts2 = Counter(hashes2)
+    union = sum((counts1 | counts2).values())
+    if not union:
+        return 1.0
+    return sum((counts1 & counts2).values()) / union
@@ -0,0 +1,78 @@
+import heapq
+from collections import defaultdict
+from plag_engine import compare_fingerprints
+from plag_fingerprint import winnow_kinds, ngram_profile
+from plag_allpairs import MIN_BUCKET_LIMIT, candidate_pairs, is_candidate
+from plag_batch import is_cancelled
+
+# Functions shorter than this (getters, one-line helpers) match everywhere
+# and say nothing about copying.
+MIN_FUNCTION_NODES = 20
+# Function bodies are far more numerous than files, so a fingerprint is
+# treated as common at a much lower share of the units.
+MAX_FUNCTION_FREQUENCY = 0.001
+FUNCTION_THRESHOLD = 0.7
+TOP_K = 1000
+
+
+def function_units(name, fingerprint, min_nodes=MIN_FUNCTION_NODES):
+    # Each top-level function becomes a fingerprint of its own, in the same
+    # shape as a file's so the usual comparators apply.
+    units = []
+    for function in fingerprint.get("functions", []):
+        if function["end"] - function["start"] < min_nodes:
+            continue
+        kinds = fingerprint["kinds"][function["start"]:function["end"]]
+        units.append({
+            "file": name,
+            "function": function["name"],
+            "line": function["line"],
+            "language": fingerprint["language"],
+            "nodes": len(kinds),
+            "hash": function["hash"],
+            "kinds": kinds,
+            "ngrams": ngram_profile(kinds),
+            "winnow": winnow_kinds(kinds),
+        })
+    return units
+
+def build_function_index(units):
+    index = defaultdict(list)
+    for unit_id, unit in enumerate(units):
+        for value in set(unit["winnow"]):
+            index[value].append(unit_id)
+    return index
+
+def function_bucket_limit(count):
+    return max(MIN_BUCKET_LIMIT, int(count * MAX_FUNCTION_FREQUENCY))
+
+def function_matches(named_fingerprints, threshold=None, top_k=TOP_K, min_nodes=MIN_FUNCTION_NODES, cancel=None):
+    # Candidate pairs come from shared winnowing fingerprints in one
+    # inverted index over every function, so only functions with something
+    # in common are ever scored.
+    if threshold is None:
+        threshold = FUNCTION_THRESHOLD
+    units = []
+    for name, fingerprint in named_fingerprints:
+        if fingerprint is not None:
+            units.extend(function_units(name, fingerprint, min_nodes))
+    index = build_function_index(units)
+    matches = []
+    for (i, j), shared in candidate_pairs(index, len(units), function_bucket_limit(len(units))).items():
+        if is_cancelled(cancel):
+            break
+        unit1, unit2 = units[i], units[j]
+        if unit1["file"] == unit2["file"] or not is_candidate(shared, unit1, unit2):
+            continue
+        similarity = compare_fingerprints(unit1, unit2, threshold)
+        if similarity >= threshold:
+            matches.append((similarity, shared, i, j))
+    rows = []
+    for similarity, shared, i, j in heapq.nlargest(top_k, matches):
+        unit1, unit2 = units[i], units[j]
+        rows.append({
+            "file1": unit1["file"], "function1": unit1["function"], "line1": unit1["line"],
+            "file2": unit2["file"], "function2": unit2["function"], "line2": unit2["line"],
+            "similarity": similarity, "shared_fingerprints": shared,
+        })
+    return rows
@@ -0,0 +1,177 @@
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+import zlib
+from plag_profile import stage
+
+LANGUAGE_EXTENSIONS = {
+    "Python": (".py",),
+    "Java": (".java",),
+    "C/C++": (".c", ".cpp", ".cc", ".cxx"),
+}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+# Members larger than this are generated or vendored code, not submissions.
+MAX_MEMBER_BYTES = 5 * 1024 * 1024
+# What a damaged archive or an unreadable file raises while being read.
+READ_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile, tarfile.TarError)
+
+
+def detect_language(name):
+    name = name.lower()
+    for language, extensions in LANGUAGE_EXTENSIONS.items():
+        if name.endswith(extensions):
+            return language
+    return None
+
+def is_archive(path):
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+def decode_source(data):
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+def read_member_data(name, read):
+    # One bad member only costs its own row; the rest are still read.
+    try:
+        with stage("read"):
+            return read()
+    except READ_ERRORS as e:
+        print(f"Unreadable source {name}: {e}", file=sys.stderr)
+        return None
+
+def iter_zip_members(path, language):
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or detect_language(info.filename) != language:
+                continue
+            if info.file_size > MAX_MEMBER_BYTES:
+                print(f"Skipping oversized member {info.filename}", file=sys.stderr)
+                continue
+            name = f"{path}/{info.filename}"
+            yield name, read_member_data(name, lambda: archive.read(info))
+
+def iter_tar_members(path, language):
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and detect_language(member.name) == language:
+                if member.size > MAX_MEMBER_BYTES:
+                    print(f"Skipping oversized member {member.name}", file=sys.stderr)
+                else:
+                    name = f"{path}/{member.name}"
+                    yield name, read_member_data(name, lambda: archive.extractfile(member).read())
+            # TarFile remembers every header it has read; drop them so a
+            # long archive doesn't accumulate one TarInfo per member.
+            archive.members = []
+
+def iter_directory_members(path, language):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if detect_language(name) != language:
+                continue
+            file_path = os.path.join(root, name)
+            try:
+                oversized = os.path.getsize(file_path) > MAX_MEMBER_BYTES
+            except OSError as e:
+                print(f"Unreadable file {file_path}: {e}", file=sys.stderr)
+                yield file_path, None
+                continue
+            if oversized:
+                print(f"Skipping oversized file {file_path}", file=sys.stderr)
+                continue
+            yield file_path, read_member_data(file_path, lambda: read_bytes(file_path))
+
+def read_bytes(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+def iter_members(path, language):
+    # Yields (name, data) for each source of the language, with data None
+    # for members that could not be read.
+    if os.path.isdir(path):
+        return iter_directory_members(path, language)
+    if zipfile.is_zipfile(path):
+        return iter_zip_members(path, language)
+    return iter_tar_members(path, language)
+
+def iter_member_names(path, language):
+    # The same members iter_members yields, without reading them.
+    if os.path.isdir(path):
+        names = ((os.path.join(root, name), None) for root, _, files in os.walk(path) for name in files)
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [(info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+    else:
+        with tarfile.open(path, 'r:*') as archive:
+            names = [(member.name, member.size) for member in archive.getmembers() if member.isfile()]
+    for name, size in names:
+        if detect_language(name) != language:
+            continue
+        if size is None:
+            try:
+                size = os.path.getsize(name)
+            except OSError:
+                # Still yielded by iter_members, as an unreadable row.
+                size = 0
+        if size <= MAX_MEMBER_BYTES:
+            yield name
+
+def count_sources(paths, language):
+    total = 0
+    for path in paths:
+        if os.path.isdir(path) or is_archive(path):
+            try:
+                total += sum(1 for _ in iter_member_names(path, language))
+            except READ_ERRORS:
+                total += 1
+        else:
+            total += 1
+    return total
+
+def read_member(archive_path, member_name):
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read(member_name)
+    with tarfile.open(archive_path, 'r:*') as archive:
+        return archive.extractfile(member_name).read()
+
+def read_source_by_name(name):
+    # Names come from iter_sources: either a plain path or
+    # "<archive path>/<member name>".
+    if os.path.isfile(name):
+        return read_file_source(name)
+    archive_path = os.path.dirname(name)
+    while not os.path.isfile(archive_path):
+        parent = os.path.dirname(archive_path)
+        if parent == archive_path:
+            return None
+        archive_path = parent
+    try:
+        return decode_source(read_member(archive_path, name[len(archive_path) + 1:]))
+    except (KeyError,) + READ_ERRORS as e:
+        print(f"Unreadable member {name}: {e}", file=sys.stderr)
+        return None
+
+def read_file_source(file_path):
+    try:
+        with stage("read"), open(file_path, 'rb') as file:
+            return decode_source(file.read())
+    except OSError as e:
+        print(f"Unreadable file {file_path}: {e}", file=sys.stderr)
+        return None
+
+def iter_sources(paths, language):
+    for path in paths:
+        if os.path.isdir(path) or is_archive(path):
+            try:
+                for name, data in iter_members(path, language):
+                    yield name, None if data is None else decode_source(data)
+            except READ_ERRORS as e:
+                print(f"Unreadable archive {path}: {e}", file=sys.stderr)
+                yield path, None
+        else:
+            yield path, read_file_source(path)
@@ -0,0 +1,177 @@
+import hashlib
+import sqlite3
+import sys
+import time
+import numpy as np
+from plag_engine import NORMALIZER_VERSION, compare_fingerprints, parser_version, template_digest
+from plag_cache import encode_fingerprint, decode_fingerprint
+from plag_fingerprint import WINNOW_K, kgram_hashes
+
+# Shingles are the node-kind k-grams the winnowing uses. Unrelated files
+# share about 0.03-0.1 of them, copies scored above 0.8 at least 0.55;
+# shorter n-grams are common to any two programs and put nearly the whole
+# index in every query's buckets. 42 bands of 3 rows: pairs above roughly
+# 0.3 shingle Jaccard share a bucket in at least one band with high
+# probability.
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 42
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+MINHASH_SEED = 1
+MINHASH_PRIME = (1 << 31) - 1
+TOP_K = 20
+RECALL_THRESHOLD = 0.8
+
+# Changing any of these makes stored signatures incomparable with new ones.
+INDEX_CONFIG = f"normalizer={NORMALIZER_VERSION};shingles=k{WINNOW_K};permutations={MINHASH_PERMUTATIONS};bands={LSH_BANDS};seed={MINHASH_SEED}"
+
+generator = np.random.default_rng(MINHASH_SEED)
+hash_a = generator.integers(1, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+hash_b = generator.integers(0, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash_signature(fingerprint):
+    shingles = np.unique(np.array(kgram_hashes(fingerprint["kinds"]), dtype=np.uint64))
+    if shingles.size == 0:
+        return None
+    values = (shingles & np.uint64(0xFFFFFFFF)) % np.uint64(MINHASH_PRIME)
+    hashed = (hash_a[:, None] * values[None, :] + hash_b[:, None]) % np.uint64(MINHASH_PRIME)
+    return hashed.min(axis=1)
+
+def band_keys(signature):
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return keys
+
+def open_index(path, language, rebuild=False):
+    db = sqlite3.connect(str(path), timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    db.execute("""CREATE TABLE IF NOT EXISTS submissions (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        language TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        added REAL NOT NULL,
+        UNIQUE (name, language))""")
+    db.execute("""CREATE TABLE IF NOT EXISTS buckets (
+        language TEXT NOT NULL,
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        submission INTEGER NOT NULL)""")
+    db.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (language, band, bucket)")
+    db.execute("CREATE INDEX IF NOT EXISTS buckets_submission ON buckets (submission)")
+    # Stored fingerprints have the starter code of their day subtracted.
+    templates = template_digest()
+    config = f"{INDEX_CONFIG};templates={templates}" if templates else INDEX_CONFIG
+    # An index can hold years of submissions, so a mismatch is only ever
+    # cleared when asked to; otherwise the index is left untouched.
+    row = db.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+    if row is not None and row[0] != config:
+        if not rebuild:
+            db.close()
+            raise RuntimeError(f"Index {path} was built with {row[0]}, not {config}")
+        print(f"Index {path} was built with {row[0]}; clearing it", file=sys.stderr)
+        db.execute("DELETE FROM buckets")
+        db.execute("DELETE FROM submissions")
+    db.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (config,))
+    # Each language's entries are only comparable with fingerprints from
+    # the same parser, lexer mode included.
+    version = parser_version(language)
+    row = db.execute("SELECT value FROM meta WHERE key = ?", (f"parser:{language}",)).fetchone()
+    if row is not None and row[0] != version:
+        if not rebuild:
+            db.close()
+            raise RuntimeError(f"{language} entries in {path} were built with {row[0]}, not {version}")
+        print(f"{language} entries in {path} were built with {row[0]}; clearing them", file=sys.stderr)
+        db.execute("DELETE FROM buckets WHERE language = ?", (language,))
+        db.execute("DELETE FROM submissions WHERE language = ?", (language,))
+    db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f"parser:{language}", version))
+    db.commit()
+    return db
+
+def insert_submissions(db, named_fingerprints, language):
+    # Re-adding a name replaces its earlier fingerprint and buckets, so a
+    # resubmission doesn't leave a stale copy in the index.
+    added = 0
+    for name, fingerprint in named_fingerprints:
+        if fingerprint is None:
+            print(f"Not indexing {name}: invalid code", file=sys.stderr)
+            continue
+        signature = minhash_signature(fingerprint)
+        old = db.execute("SELECT id FROM submissions WHERE name = ? AND language = ?", (name, language)).fetchone()
+        if old is not None:
+            db.execute("DELETE FROM buckets WHERE submission = ?", old)
+            db.execute("DELETE FROM submissions WHERE id = ?", old)
+        cursor = db.execute("INSERT INTO submissions (name, language, fingerprint, added) VALUES (?, ?, ?, ?)",
+                            (name, language, encode_fingerprint(fingerprint), time.time()))
+        if signature is not None:
+            db.executemany("INSERT INTO buckets VALUES (?, ?, ?, ?)",
+                           [(language, band, bucket, cursor.lastrowid) for band, bucket in band_keys(signature)])
+        added += 1
+    db.commit()
+    return added
+
+def candidate_ids(db, fingerprint, language):
+    signature = minhash_signature(fingerprint)
+    if signature is None:
+        return set()
+    found = set()
+    for band, bucket in band_keys(signature):
+        rows = db.execute("SELECT submission FROM buckets WHERE language = ? AND band = ? AND bucket = ?", (language, band, bucket))
+        found.update(row[0] for row in rows)
+    return found
+
+def rank_candidates(db, fingerprint, ids, top_k=TOP_K, threshold=None):
+    scored = []
+    for submission in ids:
+        name, data = db.execute("SELECT name, fingerprint FROM submissions WHERE id = ?", (submission,)).fetchone()
+        similarity = compare_fingerprints(fingerprint, decode_fingerprint(data), threshold)
+        if not threshold or similarity >= threshold:
+            scored.append((name, similarity))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_k]
+
+def query_index(db, fingerprint, language, top_k=TOP_K, threshold=None):
+    if fingerprint is None:
+        return []
+    return rank_candidates(db, fingerprint, candidate_ids(db, fingerprint, language), top_k, threshold)
+
+def brute_force(db, fingerprint, language, top_k=TOP_K, threshold=None):
+    ids = [row[0] for row in db.execute("SELECT id FROM submissions WHERE language = ?", (language,))]
+    return rank_candidates(db, fingerprint, ids, top_k, threshold)
+
+def measure_recall(db, named_fingerprints, language, top_k=TOP_K, threshold=RECALL_THRESHOLD):
+    # Every brute-force match at or above the threshold is one the index
+    # should have found; recall is the share of those it returned. Queries
+    # are usually indexed themselves, and finding yourself doesn't count.
+    expected = found = queries = candidates = 0
+    lsh_seconds = brute_seconds = 0.0
+    for name, fingerprint in named_fingerprints:
+        if fingerprint is None:
+            continue
+        queries += 1
+        start = time.perf_counter()
+        ids = candidate_ids(db, fingerprint, language)
+        retrieved = {match for match, _ in rank_candidates(db, fingerprint, ids, top_k, threshold) if match != name}
+        lsh_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        truth = {match for match, _ in brute_force(db, fingerprint, language, top_k, threshold) if match != name}
+        brute_seconds += time.perf_counter() - start
+        candidates += len(ids)
+        expected += len(truth)
+        found += len(truth & retrieved)
+    indexed = db.execute("SELECT COUNT(*) FROM submissions WHERE language = ?", (language,)).fetchone()[0]
+    return {
+        "queries": queries,
+        "indexed": indexed,
+        "threshold": threshold,
+        "expected_matches": expected,
+        "found_matches": found,
+        "recall": found / expected if expected else 1.0,
+        "mean_candidates": candidates / queries if queries else 0.0,
+        "lsh_seconds": lsh_seconds,
+        "brute_force_seconds": brute_seconds,
+    }
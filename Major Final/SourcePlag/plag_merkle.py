@@ -0,0 +1,90 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from plag_fingerprint import merkle_hashes
+from plag_allpairs import bucket_limit
+
+# Shared subtrees smaller than this are common idioms (a loop header, a
+# print call), not evidence of copying.
+MIN_SUBTREE_NODES = 25
+TOP_LEVEL = "<top level>"
+
+
+def subtree_roots(fingerprint, min_nodes=MIN_SUBTREE_NODES):
+    hashes, sizes = merkle_hashes(fingerprint["kinds"], fingerprint["parents"])
+    return [(position, sizes[position], hashes[position]) for position in range(len(hashes)) if sizes[position] >= min_nodes]
+
+def build_subtree_index(roots):
+    index = defaultdict(list)
+    for doc_id, doc_roots in enumerate(roots):
+        for position, _, value in doc_roots:
+            index[value].append((doc_id, position))
+    return index
+
+def function_index(fingerprint):
+    functions = fingerprint.get("functions", [])
+    return [function["start"] for function in functions], functions
+
+def function_at(starts, functions, position):
+    # Position of the top-level function holding this node, or -1.
+    slot = bisect_right(starts, position) - 1
+    if slot >= 0 and position < functions[slot]["end"]:
+        return slot
+    return -1
+
+def encloses_function(starts, position, size):
+    slot = bisect_left(starts, position)
+    return slot < len(starts) and starts[slot] < position + size
+
+def copied_functions(names, fingerprints, min_nodes=MIN_SUBTREE_NODES):
+    # Every subtree of at least min_nodes nodes goes into one hash index;
+    # each file is then walked once, reporting its largest subtrees that
+    # another file shares. Time is linear in the number of nodes, apart
+    # from buckets capped by bucket_limit.
+    roots = [subtree_roots(fingerprint, min_nodes) for fingerprint in fingerprints]
+    index = build_subtree_index(roots)
+    limit = bucket_limit(len(fingerprints))
+    lookups = [function_index(fingerprint) for fingerprint in fingerprints]
+    shared_nodes = defaultdict(int)
+    for doc_id, doc_roots in enumerate(roots):
+        starts, functions = lookups[doc_id]
+        # Per partner, the end of the last subtree matched with it. Inside
+        # that range the partner is skipped, but a smaller subtree there
+        # can still be shared with a different file.
+        matched_until = {}
+        for position, size, value in doc_roots:
+            postings = index[value]
+            if len(postings) > limit:
+                continue
+            # One posting per partner: a file holding this subtree twice
+            # still shares only these nodes of it.
+            others = {}
+            for other, other_position in postings:
+                if other > doc_id and matched_until.get(other, 0) <= position:
+                    others.setdefault(other, other_position)
+            if not others:
+                continue
+            function = function_at(starts, functions, position)
+            if function < 0 and encloses_function(starts, position, size):
+                # A shared class or block holding whole functions: report
+                # the functions themselves further down.
+                continue
+            for other, other_position in others.items():
+                matched_until[other] = position + size
+                other_starts, other_functions = lookups[other]
+                shared_nodes[(doc_id, function, other, function_at(other_starts, other_functions, other_position))] += size
+    rows = []
+    for (doc_id, function, other, other_function), nodes in shared_nodes.items():
+        functions = lookups[doc_id][1]
+        other_functions = lookups[other][1]
+        rows.append({
+            "file1": names[doc_id],
+            "function1": functions[function]["name"] if function >= 0 else TOP_LEVEL,
+            "line1": functions[function]["line"] if function >= 0 else None,
+            "file2": names[other],
+            "function2": other_functions[other_function]["name"] if other_function >= 0 else TOP_LEVEL,
+            "line2": other_functions[other_function]["line"] if other_function >= 0 else None,
+            "shared_nodes": nodes,
+            "coverage": min(1.0, nodes / (functions[function]["end"] - functions[function]["start"])) if function >= 0 else None,
+        })
+    rows.sort(key=lambda row: row["shared_nodes"], reverse=True)
+    return rows
@@ -0,0 +1,144 @@
+import heapq
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Stage totals and counters are always kept; they cost two clock reads per
+# stage. Detailed profiling adds duration histograms, the slowest files
+# and, if tracing, one Chrome trace event per stage. Turn it on with
+# enable_profiling() or by setting SOURCEPLAG_PROFILE to a report path
+# and/or SOURCEPLAG_TRACE to a trace path.
+PROFILE_PATH = os.environ.get("SOURCEPLAG_PROFILE")
+TRACE_PATH = os.environ.get("SOURCEPLAG_TRACE")
+SLOWEST_FILES = 20
+MAX_TRACE_EVENTS = 200_000
+
+detail_enabled = PROFILE_PATH is not None or TRACE_PATH is not None
+trace_enabled = TRACE_PATH is not None
+
+stage_seconds = defaultdict(float)
+stage_calls = defaultdict(int)
+counters = defaultdict(int)
+# Per stage, calls bucketed by duration: bucket b holds durations of
+# 2**(b-1) up to 2**b microseconds.
+histograms = defaultdict(lambda: defaultdict(int))
+slowest = []
+trace_events = []
+
+
+def enable_profiling(trace=False):
+    global detail_enabled, trace_enabled
+    detail_enabled = True
+    trace_enabled = trace
+
+def disable_profiling():
+    global detail_enabled, trace_enabled
+    detail_enabled = False
+    trace_enabled = False
+
+def profiling_flags():
+    return detail_enabled, trace_enabled
+
+def set_profiling_flags(flags):
+    global detail_enabled, trace_enabled
+    detail_enabled, trace_enabled = flags
+
+def record(name, start, seconds):
+    stage_seconds[name] += seconds
+    stage_calls[name] += 1
+    if detail_enabled:
+        histograms[name][int(seconds * 1e6).bit_length()] += 1
+        if trace_enabled and len(trace_events) < MAX_TRACE_EVENTS:
+            trace_events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6, "pid": os.getpid(), "tid": threading.get_native_id()})
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - start)
+
+@contextmanager
+def file_stage(file_name):
+    # Times one submission from reading to score, for the slowest-files
+    # list. Only does any work when detailed profiling is on.
+    if not detail_enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        keep_slowest(seconds, file_name)
+        if trace_enabled and len(trace_events) < MAX_TRACE_EVENTS:
+            trace_events.append({"name": file_name, "cat": "file", "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6,
+                                 "pid": os.getpid(), "tid": threading.get_native_id()})
+
+def keep_slowest(seconds, file_name):
+    if len(slowest) < SLOWEST_FILES:
+        heapq.heappush(slowest, (seconds, file_name))
+    elif seconds > slowest[0][0]:
+        heapq.heapreplace(slowest, (seconds, file_name))
+
+def count(name, amount=1):
+    counters[name] += amount
+
+def stage_report():
+    report = {
+        "stages": {name: {"calls": stage_calls[name], "seconds": stage_seconds[name]} for name in stage_seconds},
+        "counters": dict(counters),
+    }
+    if detail_enabled:
+        report["histograms_us"] = {name: {f"<{1 << bucket}": calls for bucket, calls in sorted(buckets.items())}
+                                   for name, buckets in histograms.items()}
+        report["slowest_files"] = [{"file": name, "seconds": seconds} for seconds, name in sorted(slowest, reverse=True)]
+    return report
+
+def reset_stages():
+    stage_seconds.clear()
+    stage_calls.clear()
+    counters.clear()
+    histograms.clear()
+    slowest.clear()
+    trace_events.clear()
+
+def drain_profile():
+    data = (dict(stage_seconds), dict(stage_calls), dict(counters),
+            {name: dict(buckets) for name, buckets in histograms.items()}, list(slowest), list(trace_events))
+    reset_stages()
+    return data
+
+def merge_profile(data):
+    seconds, calls, counts, worker_histograms, worker_slowest, worker_events = data
+    for name, value in seconds.items():
+        stage_seconds[name] += value
+    for name, value in calls.items():
+        stage_calls[name] += value
+    for name, value in counts.items():
+        counters[name] += value
+    for name, buckets in worker_histograms.items():
+        for bucket, value in buckets.items():
+            histograms[name][bucket] += value
+    for seconds_taken, file_name in worker_slowest:
+        keep_slowest(seconds_taken, file_name)
+    trace_events.extend(worker_events[:MAX_TRACE_EVENTS - len(trace_events)])
+
+def write_report(path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(stage_report(), file, indent=2)
+
+def write_chrome_trace(path):
+    # Loadable in chrome://tracing or Perfetto.
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+def write_configured_reports():
+    if PROFILE_PATH:
+        write_report(PROFILE_PATH)
+    if TRACE_PATH:
+        write_chrome_trace(TRACE_PATH)
@@ -0,0 +1,52 @@
+from plag_batch import map_unordered, compare_source_in_worker, install_reference
+from plag_engine import parser_version, template_digest
+from plag_cache import cached_fingerprint, content_digest
+from plag_ingest import iter_sources
+
+# Scores from the last run, keyed by submission name. A file is only sent
+# for comparison again when its content or the reference has changed.
+session_key = None
+session_scores = {}
+
+
+def reset_session():
+    global session_key
+    session_key = None
+    session_scores.clear()
+
+def forget(names):
+    for name in names:
+        session_scores.pop(name, None)
+
+def rescore(source_code, paths, language, names=None, workers=None, threshold=None, cancel=None):
+    # Yields (name, similarity) for every current submission. Unchanged ones
+    # come straight from the session; only the rest are compared. When
+    # names is given, sources outside it are skipped.
+    global session_key
+    key = (content_digest(source_code), language, parser_version(language), threshold, template_digest())
+    if key != session_key:
+        session_scores.clear()
+        session_key = key
+    unchanged = []
+    digests = {}
+
+    def changed_sources():
+        for name, code in iter_sources(paths, language):
+            if names is not None and name not in names and code is not None:
+                continue
+            digest = None if code is None else content_digest(code)
+            stored = session_scores.get(name)
+            if stored is not None and stored[0] == digest:
+                unchanged.append((name, stored[1]))
+                continue
+            digests[name] = digest
+            yield name, code
+
+    reference = cached_fingerprint(source_code, language)
+    for name, similarity in map_unordered(compare_source_in_worker, changed_sources(), language, workers,
+                                          install_reference, (reference, threshold), cancel):
+        session_scores[name] = (digests.pop(name), similarity)
+        yield from unchanged
+        unchanged.clear()
+        yield name, similarity
+    yield from unchanged
@@ -0,0 +1,265 @@
+import random
+
+# Submissions are random programs built from a tiny statement grammar and
+# printed as Python, Java or C++. Plagiarized copies apply the edits
+# students make to hide copying: renamed identifiers, reordered functions
+# and inserted dead code.
+MIN_FUNCTIONS = 3
+MAX_FUNCTIONS = 6
+MIN_STATEMENTS = 3
+MAX_STATEMENTS = 7
+MAX_DEPTH = 2
+PLAGIARISM_RATE = 0.3
+VARIANT_EDITS = ("rename", "reorder", "dead_code")
+OPERATORS = ("+", "-", "*")
+COMPARISONS = ("<", ">", "==", "!=")
+EXTENSIONS = {"Python": ".py", "Java": ".java", "C/C++": ".cpp"}
+
+
+def random_expression(rng, names, functions, depth=0):
+    roll = rng.random()
+    if depth >= MAX_DEPTH or roll < 0.3:
+        return ("num", rng.randint(0, 99)) if rng.random() < 0.4 else ("var", rng.choice(names))
+    if roll < 0.85 or not functions:
+        return ("bin", rng.choice(OPERATORS), random_expression(rng, names, functions, depth + 1),
+                random_expression(rng, names, functions, depth + 1))
+    name, arity = rng.choice(functions)
+    return ("call", name, [random_expression(rng, names, functions, depth + 1) for _ in range(arity)])
+
+def random_condition(rng, names, functions):
+    return ("cmp", rng.choice(COMPARISONS), random_expression(rng, names, functions, 1), random_expression(rng, names, functions, 1))
+
+def random_block(rng, names, functions, count, depth=0):
+    block = []
+    for _ in range(count):
+        roll = rng.random()
+        if depth < MAX_DEPTH and roll < 0.2:
+            block.append(("if", random_condition(rng, names, functions),
+                          random_block(rng, names, functions, rng.randint(1, 3), depth + 1),
+                          random_block(rng, names, functions, rng.randint(0, 2), depth + 1)))
+        elif depth < MAX_DEPTH and roll < 0.35:
+            counter = f"i{depth}"
+            block.append(("for", counter, random_expression(rng, names, functions, 1),
+                          random_block(rng, names + [counter], functions, rng.randint(1, 3), depth + 1)))
+        elif depth < MAX_DEPTH and roll < 0.45:
+            block.append(("while", random_condition(rng, names, functions),
+                          random_block(rng, names, functions, rng.randint(1, 3), depth + 1)))
+        else:
+            target = rng.choice(names) if rng.random() < 0.5 else f"v{len(names)}"
+            block.append(("assign", target, random_expression(rng, names, functions)))
+            if target not in names:
+                names = names + [target]
+    return block
+
+def random_program(rng):
+    functions = []
+    program = []
+    for index in range(rng.randint(MIN_FUNCTIONS, MAX_FUNCTIONS)):
+        params = [f"p{i}" for i in range(rng.randint(1, 3))]
+        body = random_block(rng, list(params), list(functions), rng.randint(MIN_STATEMENTS, MAX_STATEMENTS))
+        body.append(("return", random_expression(rng, params, [])))
+        name = f"f{index}"
+        program.append((name, params, body))
+        functions.append((name, len(params)))
+    return program
+
+def walk_names(node, found):
+    if isinstance(node, tuple):
+        if node[0] in ("var", "assign", "for"):
+            found.add(node[1])
+        for child in node[1:]:
+            walk_names(child, found)
+    elif isinstance(node, list):
+        for child in node:
+            walk_names(child, found)
+    return found
+
+def rename_node(node, mapping):
+    if isinstance(node, tuple):
+        if node[0] in ("var", "assign", "for", "call"):
+            return (node[0], mapping.get(node[1], node[1])) + tuple(rename_node(child, mapping) for child in node[2:])
+        return tuple(rename_node(child, mapping) if isinstance(child, (tuple, list)) else child for child in node)
+    if isinstance(node, list):
+        return [rename_node(child, mapping) for child in node]
+    return node
+
+def rename_identifiers(program, rng):
+    names = {name for name, _, _ in program}
+    for _, params, body in program:
+        names.update(params)
+        walk_names(body, names)
+    fresh = rng.sample(range(10000, 99999), len(names))
+    words = ("count", "total", "value", "item", "temp", "result", "acc", "idx", "data", "node")
+    mapping = {name: f"{rng.choice(words)}_{number}" for name, number in zip(sorted(names), fresh)}
+    return [(mapping[name], [mapping[p] for p in params], rename_node(body, mapping)) for name, params, body in program]
+
+def reorder_functions(program, rng):
+    program = list(program)
+    rng.shuffle(program)
+    return program
+
+def insert_dead_code(program, rng):
+    edited = []
+    for name, params, body in program:
+        body = list(body)
+        for _ in range(rng.randint(1, 2)):
+            dead = ("if", ("cmp", ">", ("num", 0), ("num", 1)), [("assign", f"unused{rng.randint(0, 999)}", ("num", rng.randint(0, 99)))], [])
+            body.insert(rng.randint(0, len(body) - 1), dead)
+        edited.append((name, params, body))
+    return edited
+
+EDITS = {
+    "rename": rename_identifiers,
+    "reorder": reorder_functions,
+    "dead_code": insert_dead_code,
+}
+
+def make_variant(program, rng):
+    edits = rng.sample(VARIANT_EDITS, rng.randint(1, len(VARIANT_EDITS)))
+    for edit in VARIANT_EDITS:
+        if edit in edits:
+            program = EDITS[edit](program, rng)
+    return program, sorted(edits)
+
+def render_expression(node):
+    kind = node[0]
+    if kind == "num":
+        return str(node[1])
+    if kind == "var":
+        return node[1]
+    if kind == "bin":
+        return f"({render_expression(node[2])} {node[1]} {render_expression(node[3])})"
+    if kind == "cmp":
+        return f"{render_expression(node[2])} {node[1]} {render_expression(node[3])}"
+    return f"{node[1]}({', '.join(render_expression(arg) for arg in node[2])})"
+
+def render_python_block(block, indent):
+    pad = "    " * indent
+    lines = []
+    for node in block:
+        kind = node[0]
+        if kind == "assign":
+            lines.append(f"{pad}{node[1]} = {render_expression(node[2])}")
+        elif kind == "return":
+            lines.append(f"{pad}return {render_expression(node[1])}")
+        elif kind == "if":
+            lines.append(f"{pad}if {render_expression(node[1])}:")
+            lines.extend(render_python_block(node[2], indent + 1) or [f"{pad}    pass"])
+            if node[3]:
+                lines.append(f"{pad}else:")
+                lines.extend(render_python_block(node[3], indent + 1))
+        elif kind == "for":
+            lines.append(f"{pad}for {node[1]} in range({render_expression(node[2])}):")
+            lines.extend(render_python_block(node[3], indent + 1))
+        else:
+            lines.append(f"{pad}while {render_expression(node[1])}:")
+            lines.extend(render_python_block(node[2], indent + 1))
+    return lines
+
+def render_braced_block(block, indent):
+    pad = "    " * indent
+    lines = []
+    for node in block:
+        kind = node[0]
+        if kind == "assign":
+            lines.append(f"{pad}{node[1]} = {render_expression(node[2])};")
+        elif kind == "return":
+            lines.append(f"{pad}return {render_expression(node[1])};")
+        elif kind == "if":
+            lines.append(f"{pad}if ({render_expression(node[1])}) {{")
+            lines.extend(render_braced_block(node[2], indent + 1))
+            if node[3]:
+                lines.append(f"{pad}}} else {{")
+                lines.extend(render_braced_block(node[3], indent + 1))
+            lines.append(f"{pad}}}")
+        elif kind == "for":
+            lines.append(f"{pad}for (int {node[1]} = 0; {node[1]} < {render_expression(node[2])}; {node[1]}++) {{")
+            lines.extend(render_braced_block(node[3], indent + 1))
+            lines.append(f"{pad}}}")
+        else:
+            lines.append(f"{pad}while ({render_expression(node[1])}) {{")
+            lines.extend(render_braced_block(node[2], indent + 1))
+            lines.append(f"{pad}}}")
+    return lines
+
+def braced_locals(params, body):
+    loop_counters = set()
+    def collect(node):
+        if isinstance(node, tuple):
+            if node[0] == "for":
+                loop_counters.add(node[1])
+            for child in node[1:]:
+                collect(child)
+        elif isinstance(node, list):
+            for child in node:
+                collect(child)
+    collect(body)
+    return sorted(walk_names(body, set()) - set(params) - loop_counters)
+
+def render_braced_function(name, params, body, indent, prefix):
+    pad = "    " * indent
+    lines = [f"{pad}{prefix}int {name}({', '.join(f'int {p}' for p in params)}) {{"]
+    lines.extend(f"{pad}    int {local} = 0;" for local in braced_locals(params, body))
+    lines.extend(render_braced_block(body, indent + 1))
+    lines.append(f"{pad}}}")
+    return lines
+
+def render_program(program, language):
+    entry = program[-1]
+    call = f"{entry[0]}({', '.join('1' for _ in entry[1])})"
+    if language == "Python":
+        lines = []
+        for name, params, body in program:
+            lines.append(f"def {name}({', '.join(params)}):")
+            lines.extend(render_python_block(body, 1))
+            lines.append("")
+        lines.append(f"print({call})")
+    elif language == "Java":
+        lines = ["public class Main {"]
+        for name, params, body in program:
+            lines.extend(render_braced_function(name, params, body, 1, "static "))
+        lines.append("    public static void main(String[] args) {")
+        lines.append(f"        System.out.println({call});")
+        lines.append("    }")
+        lines.append("}")
+    else:
+        lines = ["#include <cstdio>", ""]
+        lines.extend(f"int {name}({', '.join(f'int {p}' for p in params)});" for name, params, _ in program)
+        for name, params, body in program:
+            lines.append("")
+            lines.extend(render_braced_function(name, params, body, 0, ""))
+        lines.append("")
+        lines.append("int main() {")
+        lines.append(f"    printf(\"%d\\n\", {call});")
+        lines.append("    return 0;")
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def generate_corpus(language, size, seed=0, plagiarism_rate=PLAGIARISM_RATE):
+    # Returns a list of submissions as dicts: name, code, family (the
+    # original they derive from) and the edits applied, if any.
+    rng = random.Random(seed)
+    extension = EXTENSIONS[language]
+    variants = int(size * plagiarism_rate)
+    originals = []
+    submissions = []
+    for index in range(size - variants):
+        program = random_program(rng)
+        originals.append(program)
+        submissions.append({"name": f"original{index}{extension}", "code": render_program(program, language), "family": index, "edits": []})
+    for index in range(variants):
+        family = rng.randrange(len(originals))
+        program, edits = make_variant(originals[family], rng)
+        submissions.append({"name": f"variant{index}{extension}", "code": render_program(program, language), "family": family, "edits": edits})
+    rng.shuffle(submissions)
+    return submissions
+
+def write_corpus(submissions, directory):
+    import json
+    import os
+    os.makedirs(directory, exist_ok=True)
+    for submission in submissions:
+        with open(os.path.join(directory, submission["name"]), 'w', encoding='utf-8') as file:
+            file.write(submission["code"])
+    with open(os.path.join(directory, "truth.json"), 'w', encoding='utf-8') as file:
+        json.dump({submission["name"]: {"family": submission["family"], "edits": submission["edits"]} for submission in submissions}, file, indent=2)
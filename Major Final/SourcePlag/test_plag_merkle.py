@@ -0,0 +1,62 @@
+from plag_engine import prepare_reference
+from plag_merkle import copied_functions
+
+SOLVE = """def solve(values):
+    total = 0
+    for index in range(len(values)):
+        if values[index] % 2 == 0:
+            total = total + values[index] * index
+        else:
+            total = total - values[index] // 2
+    return total
+"""
+
+# Holds only solve()'s loop, inside a different function.
+LOOP_ONLY = """def other(items):
+    result = []
+    for index in range(len(items)):
+        if items[index] % 2 == 0:
+            result = result + items[index] * index
+        else:
+            result = result - items[index] // 2
+    print(result)
+"""
+
+# Holds solve()'s loop twice.
+LOOP_TWICE = """def twice(items):
+    result = []
+    for index in range(len(items)):
+        if items[index] % 2 == 0:
+            result = result + items[index] * index
+        else:
+            result = result - items[index] // 2
+    for index in range(len(items)):
+        if items[index] % 2 == 0:
+            result = result + items[index] * index
+        else:
+            result = result - items[index] // 2
+    print(result)
+"""
+
+
+def copied_rows(sources):
+    names = sorted(sources)
+    fingerprints = [prepare_reference(sources[name], "Python") for name in names]
+    return copied_functions(names, fingerprints, min_nodes=10)
+
+def reported_pairs(sources):
+    return {(row["file1"], row["file2"]) for row in copied_rows(sources)}
+
+def test_smaller_shared_subtree_survives_a_larger_match_elsewhere():
+    # a.py's whole function is shared with c.py; the loop it shares with
+    # b.py must still be reported.
+    pairs = reported_pairs({"a.py": SOLVE, "b.py": LOOP_ONLY, "c.py": SOLVE})
+    assert pairs == {("a.py", "c.py"), ("a.py", "b.py"), ("b.py", "c.py")}
+
+def test_pair_reported_without_third_file():
+    assert reported_pairs({"a.py": SOLVE, "b.py": LOOP_ONLY}) == {("a.py", "b.py")}
+
+def test_partner_holding_a_subtree_twice_counts_it_once():
+    rows = copied_rows({"a.py": SOLVE, "b.py": LOOP_TWICE})
+    loop = copied_rows({"a.py": SOLVE, "b.py": LOOP_ONLY})
+    assert [row["shared_nodes"] for row in rows] == [row["shared_nodes"] for row in loop]